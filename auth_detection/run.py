@@ -50,7 +50,7 @@ class Auth_Craw(Task):
         """
         Main function
         """
-        link_crawler = LinkCrawler()
+        link_crawler = LinkCrawler(sitemaps=True)
         link_crawler.stop_callback = self._check_stop
         link_crawler.link_callback = self.collect_login_urls
         link_crawler.link_content_callback = self.collect_urls_login_forms
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""
+Result writer benchmark: compares the number of write() system calls and the
+wall time of per-line flushing against the buffered core.output.ResultWriter.
+
+Usage: python benchmarks/result_writer.py [line count]
+"""
+
+import io
+import os
+import sys
+import tempfile
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from core import Task
+from core.output import ResultWriter
+
+
+class CountingFileIO(io.FileIO):
+    """
+    Raw file which counts write() system calls
+    """
+    calls = 0
+
+    def write(self, data):
+        """
+        Write data
+        """
+        self.calls += 1
+        return io.FileIO.write(self, data)
+
+
+def open_counting(path):
+    """
+    Open buffered file on top of the counting raw file
+    """
+    raw = CountingFileIO(path, "w")
+    return raw, io.BufferedWriter(raw)
+
+
+def write_line_flush(path, lines):
+    """
+    Per-line flush, as Task._write_result used to do it
+    """
+    raw, stream = open_counting(path)
+
+    for line in lines:
+        stream.write(line.encode("utf-8"))
+        stream.write("\n")
+        stream.flush()
+
+    stream.close()
+
+    return raw.calls
+
+
+def write_buffered(path, lines):
+    """
+    Task._write_result with the buffered result writer
+    """
+    raw, stream = open_counting(path)
+
+    task = Task()
+    task._result = ResultWriter(stream)
+
+    for line in lines:
+        task._write_result(line)
+
+    task._result.close()
+    stream.close()
+
+    return raw.calls
+
+
+def main():
+    """
+    Run the benchmark
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    lines = [u"sub%d.example.com" % i for i in xrange(count)]
+    path = tempfile.mktemp()
+
+    try:
+        for name, func in (("per-line flush", write_line_flush), ("ResultWriter", write_buffered)):
+            started = time()
+            calls = func(path, lines)
+
+            print "%-16s %8d lines %8d write() calls %8.3f s" % (name, count, calls, time() - started)
+
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+Script startup benchmark: measures the time from process launch until the
+task's main() is called for every script, i.e. the cost of interpreter
+startup, imports and input parsing which is paid before any real work.
+
+Usage: python benchmarks/startup.py [--repeat N] [script ...]
+"""
+
+import os
+import sys
+import tempfile
+from glob import glob
+from subprocess import Popen, PIPE, STDOUT
+from time import time
+from threading import Timer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+LIB = os.path.join(ROOT, "lib")
+TIMEOUT = 60
+READY = "GTTA-STARTUP-READY"
+
+# stops the task right before its main() would be called
+BOOTSTRAP = """
+import os, sys
+sys.path.insert(0, %(lib)r)
+sys.argv = [%(script)r, %(target)r, %(result)r]
+
+import core
+
+def _ready(self, *args, **kwargs):
+    sys.stdout.write(%(ready)r + "\\n")
+    sys.stdout.flush()
+    os._exit(0)
+
+def _load(task_class):
+    core._task_loader = None
+    task_class.main = _ready
+    task_class.MULTITHREADED = False
+    task_class.ASYNC = False
+    task_class.PROCESSES = 0
+    core.execute_task(task_class)
+
+core._task_loader = _load
+execfile(%(script)r, {"__name__": "__main__", "__file__": %(script)r})
+"""
+
+
+def is_python(path):
+    """
+    Check if the script is a Python script
+    """
+    with open(path) as f:
+        line = f.readline()
+
+    return "perl" not in line
+
+
+def measure(script, target, result):
+    """
+    Start the script and get the time until its main() is called
+    """
+    code = BOOTSTRAP % {
+        "lib": LIB,
+        "script": script,
+        "target": target,
+        "result": result,
+        "ready": READY,
+    }
+
+    started = time()
+    process = Popen([sys.executable, "-c", code], cwd=os.path.dirname(script), stdout=PIPE, stderr=STDOUT)
+    timer = Timer(TIMEOUT, process.kill)
+    timer.start()
+
+    try:
+        output = []
+
+        for line in iter(process.stdout.readline, ""):
+            if line.strip() == READY:
+                return time() - started, None
+
+            output.append(line)
+
+        process.wait()
+
+    finally:
+        timer.cancel()
+
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+    lines = [line.strip() for line in output if line.strip()]
+
+    return None, lines[-1] if lines else "exited with status %s" % process.returncode
+
+
+def main():
+    """
+    Run the benchmark
+    """
+    args = sys.argv[1:]
+    repeat = 1
+    scripts = []
+
+    while args:
+        arg = args.pop(0)
+
+        if arg == "--repeat":
+            repeat = int(args.pop(0))
+        else:
+            scripts.append(os.path.abspath(os.path.join(arg, "run.py") if os.path.isdir(arg) else arg))
+
+    if not scripts:
+        scripts = sorted(os.path.abspath(path) for path in glob(os.path.join(ROOT, "*", "run.py")))
+
+    scripts = [script for script in scripts if is_python(script)]
+
+    fd, target = tempfile.mkstemp()
+    os.write(fd, "127.0.0.1\n\n\nen\n\n")
+    os.close(fd)
+
+    fd, result = tempfile.mkstemp()
+    os.close(fd)
+
+    timings = []
+    errors = []
+
+    try:
+        for script in scripts:
+            name = os.path.basename(os.path.dirname(script))
+            best = None
+
+            for _ in xrange(repeat):
+                elapsed, error = measure(script, target, result)
+
+                if error:
+                    errors.append((name, error))
+                    break
+
+                best = elapsed if best is None else min(best, elapsed)
+
+            if best is not None:
+                timings.append((best, name))
+
+    finally:
+        os.remove(target)
+        os.remove(result)
+
+    for elapsed, name in sorted(timings, reverse=True):
+        print "%-32s %8.1f ms" % (name, elapsed * 1000)
+
+    if timings:
+        print "%-32s %8.1f ms" % ("total", sum(t for t, _ in timings) * 1000)
+
+    for name, error in sorted(errors):
+        print "%-32s failed: %s" % (name, error)
+
+
+if __name__ == "__main__":
+    main()
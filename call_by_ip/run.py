@@ -1,15 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import core.green
 import re
 from socket import gethostbyname
 import core
-import requests
+from core import http
 
 
 class CallByIPTask(core.Task):
     """
     Calling by IP task
     """
+    ASYNC = True
+    CHECKPOINT = True
     BODY_FRAGMENT_SIZE = 1000
 
     def main(self, *args):
@@ -29,7 +32,7 @@ class CallByIPTask(core.Task):
         target = '%s://%s' % (self.proto, self.ip)
 
         try:
-            req = requests.get(target)
+            req = http.get(target, timeout=self.HTTP_TIMEOUT)
 
         except Exception as e:
             self._write_result('Error opening %s: %s' % ( target, str(e) ))
@@ -4,11 +4,24 @@ $Id: check_as_peers.py,v 1.6 2013/02/07 03:05:33 dee Exp $
 """
 import socket
 from core import Task, execute_task
+from core.cache import get_cache
 
 
 class CheckASPeers(Task):
     """Check AS peers"""
 
+    def query(self, server):
+        """
+        Query cymru.com whois server
+        """
+        s = socket.socket()
+        s.connect((socket.gethostbyname(server),43))
+        s.send(' -v %s\n' % self.ip)
+        output = s.recv(4096)
+        s.close()
+
+        return output
+
     def main(self, *args):
         """
         GTTA check AS peers via cymru.com whois server
@@ -20,21 +33,14 @@ class CheckASPeers(Task):
             except Exception:
                 self._write_result('Host not found: %s' % self.host)
                 return
-        s = socket.socket()
-        s.connect((socket.gethostbyname('v4.whois.cymru.com'),43))
+        cache = get_cache()
         # query for AS
+        output = cache.fetch('cymru', ('v4.whois.cymru.com', self.ip), self.query, 'v4.whois.cymru.com')
         self._write_result('SOURCE  | v4.whois.cymru.com')
-        s.send(' -v %s\n' % self.ip)
-        output = s.recv(4096)
-        s.close()
         self._write_result(output.strip())
         # query for AS peers
-        s = socket.socket()
-        s.connect((socket.gethostbyname('v4-peer.whois.cymru.com'),43))
+        output = cache.fetch('cymru', ('v4-peer.whois.cymru.com', self.ip), self.query, 'v4-peer.whois.cymru.com')
         self._write_result('SOURCE  | v4-peer.whois.cymru.com')
-        s.send(' -v %s\n' % self.ip)
-        output = s.recv(4096)
-        s.close()
         self._write_result(output.strip())
         self._write_result('\nUPSTREAM PEER(s) DETECTED: %s' % (len(output.strip().split('\n'))-1))
 
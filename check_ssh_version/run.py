@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import core.green
 import socket
 from socket import gethostbyname
 from core import Task, execute_task
@@ -8,6 +9,8 @@ class CheckSSHVersionTask(Task):
     """
     GTTA Check SSH version d@d.kiev.ua
     """
+    ASYNC = True
+    CHECKPOINT = True
 
     def main(self, *args):
         if not self.ip:
@@ -16,7 +16,7 @@ class CMSDetectionTask(core.Task):
             self.host or self.ip
         )
 
-        ok, cms = cms_explorer.get_cms_type(target)
+        ok, cms = cms_explorer.get_cms_type(target, self._check_stop)
 
         if not ok:
             self._write_result('CMS-Explorer call error!')
@@ -1,16 +1,18 @@
 # -*- coding: utf-8 -*-
 
-from dns.resolver import NXDOMAIN, NoAnswer, NoNameservers, Resolver
+import core.green
+from dns.resolver import NXDOMAIN, NoAnswer, NoNameservers
 from dns.exception import DNSException, Timeout
-from socket import gethostbyname
 from core import Task, execute_task
+from core.resolver import get_resolver
+from core.dedupe import Deduplicator
 from core.error import NoHostName
 
 class DNS_A(Task):
     """
     Get DNS A records
     """
-    MULTITHREADED = True
+    ASYNC = True
     TEST_TARGETS = ["google.com", "bing.com", "microsoft.com"]
 
     def main(self, *args):
@@ -23,39 +25,23 @@ class DNS_A(Task):
         if self.host.startswith("www."):
             self.host = self.host[4:]
 
-        results = []
+        results = Deduplicator()
 
         self._check_stop()
 
         try:
             # get all name servers
-            r = Resolver()
-            r.lifetime = self.DNS_TIMEOUT
-
-            name_servers = r.query(self.host, 'NS')
-            name_servers = map(lambda x: str(x), name_servers)
+            r = get_resolver()
+            ns_list = r.nameserver_ips(self.host, self.DNS_TIMEOUT)
 
             self._check_stop()
 
-            ns_list = []
-
-            for name_server in name_servers:
-                if name_server[-1] == '.':
-                    name_server = name_server[:-1]
-
-                ns_list.append(gethostbyname(name_server))
-
-            r = Resolver()
-            r.lifetime = self.DNS_TIMEOUT
-            r.nameservers = ns_list
-
-            a_records = r.query(self.host, 'A')
+            a_records = r.query(self.host, 'A', ns_list, self.DNS_TIMEOUT)
             a_records = map(lambda x: str(x), a_records)
 
             for a in a_records:
-                if str(a) not in results:
-                    results.append(str(a))
-                    self._write_result(str(a))
+                if results.add(a):
+                    self._write_result(a)
 
         except NoNameservers:
             self._write_result('No name servers.')
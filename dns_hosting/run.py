@@ -3,6 +3,7 @@
 from urllib import urlencode
 from urllib2 import urlopen, URLError, HTTPError, Request
 from core import Task, execute_task
+from core.cache import get_cache
 import json
 
 
@@ -10,6 +11,28 @@ class DNS_Hosting(Task):
     """
     Checks if there are other websites on the same server.
     """
+    def reverse_ip(self, target, api_key):
+        """
+        Get ViewDNS reverse IP response
+        """
+        # Add parameter { "page" : 2 } if u want
+        # to get next 10000 domains and increase
+        # page if u need more then that
+        params = urlencode({
+            "host": target,
+            "output": "json",
+            "apikey": api_key
+        })
+        request = Request('http://pro.viewdns.info/reverseip?%s' % params)
+        request.add_header('User-Agent', 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/535.19 (KHTML, like Gecko) Ubuntu/11.10 Chromium/18.0.1025.142 Chrome/18.0.1025.142 Safari/535.19')
+        response = urlopen(request, timeout=self.HTTP_TIMEOUT)
+
+        response = response.read()
+
+        response = json.loads(response)
+
+        return response["response"]
+
     def main(self, api_key=None, *args):
         """
         Main function
@@ -24,26 +47,17 @@ class DNS_Hosting(Task):
                 self._write_result("ViewDns API key is required.")
                 return
 
-            # Add parameter { "page" : 2 } if u want
-            # to get next 10000 domains and increase
-            # page if u need more then that
-            params = urlencode({
-                "host": target,
-                "output": "json",
-                "apikey": api_key[0]
-            })
-            request = Request('http://pro.viewdns.info/reverseip?%s' % params)
-            request.add_header('User-Agent', 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/535.19 (KHTML, like Gecko) Ubuntu/11.10 Chromium/18.0.1025.142 Chrome/18.0.1025.142 Safari/535.19')
-            response = urlopen(request, timeout=self.HTTP_TIMEOUT)
-
-            response = response.read()
-
-            response = json.loads(response)
-            response = response["response"]
-
-            if "error" in response:
-                self._write_result("Service error: %s" % response["error"])
-                return
+            cache = get_cache()
+            response = cache.get("viewdns", target)
+
+            if response is None:
+                response = self.reverse_ip(target, api_key[0])
+
+                if "error" in response:
+                    self._write_result("Service error: %s" % response["error"])
+                    return
+
+                cache.set("viewdns", target, response)
 
             if "domains" not in response:
                 self._write_result('No host names found.')
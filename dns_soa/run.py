@@ -1,11 +1,11 @@
 # -*- coding: utf-8 -*-
 
-from dns.resolver import NXDOMAIN, NoAnswer, NoNameservers, Resolver
+from dns.resolver import NXDOMAIN, NoAnswer, NoNameservers
 from dns.exception import DNSException, Timeout
-from socket import gethostbyname
 from re import match
 from core import Task, execute_task
 from core.error import TaskTimeout, NoHostName
+from core.resolver import get_resolver
 
 class DNS_SOA(Task):
     """
@@ -137,11 +137,8 @@ class DNS_SOA(Task):
 
         try:
             # get all name servers
-            r = Resolver()
-            r.lifetime = self.DNS_TIMEOUT
-
-            name_servers = r.query(self.host, 'NS')
-            name_servers = map(lambda x: str(x), name_servers)
+            r = get_resolver()
+            name_servers = r.nameservers(self.host, self.DNS_TIMEOUT)
 
             # get each server's SOA record
             for name_server in name_servers:
@@ -154,22 +151,14 @@ class DNS_SOA(Task):
                     'message' : None
                 }
 
-                # remove the trailing dot
-                if name_server[-1] == '.':
-                    name_server = name_server[:-1]
-
                 result['server'] = name_server
 
                 try:
-                    result['ip'] = gethostbyname(name_server)
+                    result['ip'] = r.gethostbyname(name_server, self.DNS_TIMEOUT)
                     self._check_stop()
 
                     try:
-                        r             = Resolver()
-                        r.lifetime    = self.DNS_TIMEOUT
-                        r.nameservers = [ result['ip'] ]
-
-                        soa_records = r.query(self.host, 'SOA')
+                        soa_records = r.query(self.host, 'SOA', [ result['ip'] ], self.DNS_TIMEOUT)
                         soa_records = map(lambda x: str(x), soa_records)
 
                         if len(soa_records) == 0:
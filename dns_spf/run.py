@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from dns.resolver import NXDOMAIN, NoAnswer, NoNameservers, Resolver
+from dns.resolver import NXDOMAIN, NoAnswer, NoNameservers
 from dns.exception import DNSException, Timeout
-from socket import gethostbyname
 from core import Task, execute_task
 from core.error import TaskTimeout, NoHostName
+from core.resolver import get_resolver
 import spf
 
 class DNS_SPF(Task):
@@ -28,29 +28,14 @@ class DNS_SPF(Task):
 
         try:
             # get all name servers
-            r = Resolver()
-            r.lifetime = self.DNS_TIMEOUT
-
-            name_servers = r.query(self.host, 'NS')
-            name_servers = map(lambda x: str(x), name_servers)
+            r = get_resolver()
+            ns_list = r.nameserver_ips(self.host, self.DNS_TIMEOUT)
 
             self._check_stop()
 
-            ns_list = []
-
-            for name_server in name_servers:
-                if name_server[-1] == '.':
-                    name_server = name_server[:-1]
-
-                ns_list.append(gethostbyname(name_server))
-
             try:
                 # check TXT record type for SPF records
-                r             = Resolver()
-                r.lifetime    = self.DNS_TIMEOUT
-                r.nameservers = ns_list
-
-                txt_records = r.query(self.host, 'TXT')
+                txt_records = r.query(self.host, 'TXT', ns_list, self.DNS_TIMEOUT)
                 txt_records = map(lambda x: str(x), txt_records)
 
                 for txt in txt_records:
@@ -71,11 +56,7 @@ class DNS_SPF(Task):
 
             try:
                 # check SPF record type for SPF records
-                r             = Resolver()
-                r.lifetime    = self.DNS_TIMEOUT
-                r.nameservers = ns_list
-
-                spf_records = r.query(self.host, 'SPF')
+                spf_records = r.query(self.host, 'SPF', ns_list, self.DNS_TIMEOUT)
                 spf_records = map(lambda x: str(x), spf_records)
 
                 if len(spf_records) > 0:
@@ -99,11 +80,7 @@ class DNS_SPF(Task):
                         record = spf_record
 
                     # get MX records
-                    r             = Resolver()
-                    r.lifetime    = self.DNS_TIMEOUT
-                    r.nameservers = ns_list
-
-                    mx_records = r.query(self.host, 'MX')
+                    mx_records = r.query(self.host, 'MX', ns_list, self.DNS_TIMEOUT)
                     mx_records = map(lambda x: str(x), mx_records)
 
                     self._check_stop()
@@ -112,7 +89,7 @@ class DNS_SPF(Task):
 
                     if mx_records and len(mx_records) > 0:
                         mx_server = str(mx_records[0]).split(' ')[1]
-                        mx_ip     = gethostbyname(mx_server)
+                        mx_ip     = r.gethostbyname(mx_server, self.DNS_TIMEOUT)
 
                     self._check_stop()
 
@@ -7,27 +7,27 @@ class Doc_Craw(Task):
     """
     GET document files from page by url, using crawler.py
     """
-    urls_set = set()
+    CHECKPOINT = True
     DOC_TYPES = ('.xls', '.xlsx', '.doc', '.docx', '.pdf', '.odt', '.txt', '.rtf')
 
     def collect_unique_urls_filter_docs(self, url):
         """
         Using as callback function for crawler, which collect unique urls and outputting documents link
         """
-        if url not in self.urls_set:
+        if self._unique("urls").add(url):
             if (url[-4:].lower() in self.DOC_TYPES) or (url[-5:].lower() in self.DOC_TYPES):
                 self._write_result(url)
 
-            self.urls_set.add(url)
             self._check_stop()
 
     def main(self, *args):
         """
         Main function
         """
-        link_crawler = LinkCrawler()
+        link_crawler = LinkCrawler(sitemaps=True)
         link_crawler.stop_callback = self._check_stop
         link_crawler.nonhtml_callback = self.collect_unique_urls_filter_docs
+        link_crawler.checkpoint_callback = lambda state: self._save_cursor({"crawler": state, "urls": self._unique("urls")})
 
         if not self.proto:
             self.proto = 'http'
@@ -37,7 +37,12 @@ class Doc_Craw(Task):
         else:
             target = self.proto + '://' + self.ip + '/'
 
-        link_crawler.process(target)  # Starting recursive process of link crawling on target
+        cursor = self._get_cursor()
+
+        if cursor:
+            self._unique("urls").update(cursor["urls"])
+
+        link_crawler.process(target, cursor and cursor["crawler"])  # Starting recursive process of link crawling on target
 
         self._check_stop()
 
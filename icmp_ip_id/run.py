@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 
 from socket import gethostbyname
-from scapy.all import sr1, IP, ICMP
+from scapy.sendrecv import sr1
+from scapy.layers.inet import IP, ICMP
 from random import randint
 from core import Task, execute_task, SANDBOX_IP
 
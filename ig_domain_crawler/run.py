@@ -8,7 +8,7 @@ class IG_Domain_Craw(Task):
     """
     Search domains from page by url, using crawler.py
     """
-    domains = set()
+    CHECKPOINT = True
 
     def collect_unique_urls(self, url):
         """
@@ -17,9 +17,8 @@ class IG_Domain_Craw(Task):
         proto_domain = url.split('//')
         domain = proto_domain[1].split('/')[0]
 
-        if domain not in self.domains:
+        if self._unique("domains").add(domain):
             self._write_result(domain)
-            self.domains.add(domain)
 
     def main(self, *args):
         """
@@ -28,11 +27,17 @@ class IG_Domain_Craw(Task):
         link_crawler = LinkCrawler()
         link_crawler.stop_callback = self._check_stop
         link_crawler.ext_link_callback = self.collect_unique_urls
+        link_crawler.checkpoint_callback = lambda state: self._save_cursor({"crawler": state, "domains": self._unique("domains")})
 
         if not self.proto:
             self.proto = 'http'
 
-        link_crawler.process(self.proto + '://' + self.host + '/')
+        cursor = self._get_cursor()
+
+        if cursor:
+            self._unique("domains").update(cursor["domains"])
+
+        link_crawler.process(self.proto + '://' + self.host + '/', cursor and cursor["crawler"])
 
     def test(self):
         """
@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
 import re
-from time import sleep
-import requests
 from BeautifulSoup import BeautifulSoup
-from core import Task, execute_task
+from core import Task, execute_task, http
+from core.ratelimit import get_limiter
 
 
 class IG_Domain_PubDB(Task):
@@ -12,6 +11,7 @@ class IG_Domain_PubDB(Task):
     """
     TEST_TIMEOUT = 60 * 60
     URL = 'http://pub-db.com'
+    REQUEST_RATE = 1  # PubDB requests per second, shared by all targets
     HEADERS = {
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         'Accept-Encoding': 'gzip, deflate, sdch',
@@ -26,13 +26,16 @@ class IG_Domain_PubDB(Task):
         """
         Get soup by path from PubDB
         """
-        return BeautifulSoup(requests.get('%s%s' % (self.URL, path), headers=self.HEADERS).content)
+        with get_limiter().limit(self.URL, rate=self.REQUEST_RATE, check=self._check_stop):
+            response = http.get('%s%s' % (self.URL, path), headers=self.HEADERS, timeout=self.HTTP_TIMEOUT)
+
+        return BeautifulSoup(response.content)
 
     def _get_request_by_proto(self, proto):
         """
         Get request by proto and self.target
         """
-        return requests.get('%s://%s' % (proto, self.target), headers=self.HEADERS)
+        return http.get('%s://%s' % (proto, self.target), headers=self.HEADERS, timeout=self.HTTP_TIMEOUT)
 
     def _exctract_pubs(self, content):
         """
@@ -89,8 +92,6 @@ class IG_Domain_PubDB(Task):
 
         # search by collected links
         for href in hrefs:
-            sleep(1)
-
             try:
                 soup = self._get_soup_by_path('%s' % href)
             except:
@@ -109,8 +110,6 @@ class IG_Domain_PubDB(Task):
 
         # get domains by pubs
         for pub in self.pubs:
-            sleep(1)
-
             try:
                 soup = self._get_soup_by_path('/adsense/%s.html' % pub)
             except:
@@ -128,8 +127,6 @@ class IG_Domain_PubDB(Task):
 
         # get domains by uas
         for ua in self.uas:
-            sleep(1)
-
             try:
                 soup = self._get_soup_by_path('/google-analytics/%s.html' % ua)
             except:
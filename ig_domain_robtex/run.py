@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
-import requests
 from BeautifulSoup import BeautifulSoup
-from core import Task, execute_task
+from core import Task, execute_task, http
 
 
 class IG_Domain_Robtex(Task):
@@ -17,9 +16,10 @@ class IG_Domain_Robtex(Task):
         results = []
 
         soup = BeautifulSoup(
-            requests.get(
+            http.get(
                 'https://www.robtex.com/q/y?q=%s' % self.target,
-                headers={'User-Agent': 'Mozilla/5.0'}
+                headers={'User-Agent': 'Mozilla/5.0'},
+                timeout=self.HTTP_TIMEOUT
             ).content
         )
 
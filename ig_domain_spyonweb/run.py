@@ -3,6 +3,8 @@
 import requests
 from requests.exceptions import ConnectionError
 from core import Task, execute_task
+from core.cache import get_cache
+from core.dedupe import Deduplicator
 from core.error import NotEnoughArguments
 
 
@@ -11,6 +13,10 @@ class IG_Domain_Spyonweb(Task):
     Search records in Spyonweb
     """
     def request(self, command, param, access_token):
+        """Cached API request"""
+        return get_cache().fetch("spyonweb", (command, param), self._request, command, param, access_token)
+
+    def _request(self, command, param, access_token):
         """API request"""
 
         try:
@@ -49,7 +55,7 @@ class IG_Domain_Spyonweb(Task):
             self._write_result("Spyonweb API key is required.")
             return
 
-        results = []
+        results = Deduplicator()
         access_token = access_token[0]
 
         if self.ip:
@@ -59,8 +65,7 @@ class IG_Domain_Spyonweb(Task):
                 return
 
             for domain in result['ip'][self.ip]['items'].keys():
-                if domain not in results:
-                    results.append(domain)
+                if results.add(domain):
                     self._write_result(domain)
 
         else:
@@ -82,8 +87,7 @@ class IG_Domain_Spyonweb(Task):
                         continue
 
                     for domain in result['adsense'][key]['items'].keys():
-                        if domain not in results:
-                            results.append(domain)
+                        if results.add(domain):
                             self._write_result(domain)
 
             for key, val in analytics_ids.items():
@@ -94,8 +98,7 @@ class IG_Domain_Spyonweb(Task):
                         continue
 
                     for domain in result['analytics'][key]['items'].keys():
-                        if domain not in results:
-                            results.append(domain)
+                        if results.add(domain):
                             self._write_result(domain)
 
             for key, val in website_ips.items():
@@ -106,8 +109,7 @@ class IG_Domain_Spyonweb(Task):
                         continue
 
                     for domain in result['ip'][key]['items'].keys():
-                        if domain not in results:
-                            results.append(domain)
+                        if results.add(domain):
                             self._write_result(domain)
 
     def test(self):
@@ -9,7 +9,7 @@ class IG_Email_Crawler(Task):
     """
     Search emails from page by url, using crawler.py
     """
-    emails = []
+    CHECKPOINT = True
 
     def collect_unique_emails(self, raw):
         """
@@ -18,9 +18,8 @@ class IG_Email_Crawler(Task):
         url, content = raw['url'], raw['content']
         soup = BeautifulSoup(content)
         for email in parse_soup(soup):
-            if email not in self.emails:
+            if self._unique("emails").add(email):
                 self._write_result(email)
-                self.emails.append(email)
 
     def main(self, *args):
         """
@@ -29,11 +28,17 @@ class IG_Email_Crawler(Task):
         link_crawler = LinkCrawler()
         link_crawler.stop_callback = self._check_stop
         link_crawler.link_content_callback = self.collect_unique_emails
+        link_crawler.checkpoint_callback = lambda state: self._save_cursor({"crawler": state, "emails": self._unique("emails")})
 
         if not self.proto:
             self.proto = 'http'
 
-        link_crawler.process(self.proto + '://' + self.host + '/')
+        cursor = self._get_cursor()
+
+        if cursor:
+            self._unique("emails").update(cursor["emails"])
+
+        link_crawler.process(self.proto + '://' + self.host + '/', cursor and cursor["crawler"])
 
     def test(self):
         """
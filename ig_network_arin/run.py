@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 
-import requests
 from BeautifulSoup import BeautifulSoup
-from core import Task, execute_task
+from core import Task, execute_task, http
+from core.cache import get_cache
+from core.dedupe import Deduplicator
 
 
 class IG_Network_Arin(Task):
@@ -11,15 +12,37 @@ class IG_Network_Arin(Task):
     """
     target = ''
 
+    def _get_customer(self, customer):
+        """
+        Get customer page
+        """
+        return http.get(
+            'http://whois.arin.net/rest/customer/%s' % customer,
+            headers={'User-Agent': 'Mozilla/5.0'},
+            timeout=self.HTTP_TIMEOUT
+        ).content
+
+    def _query(self, target):
+        """
+        Get query results page
+        """
+        return http.post(
+            'http://whois.arin.net/ui/query.do',
+            headers={'User-Agent': 'Mozilla/5.0'},
+            params={
+                'xslt': 'http://whois.arin.net/ui/arin.xsl',
+                'flushCache': 'false',
+                'queryinput': target,
+                'whoisSubmitButton': ''
+            },
+            timeout=self.HTTP_TIMEOUT
+        ).content
+
     def _extract_networks_from_customer(self, customer):
         """
         Extract networks from customer
         """
-        soup = BeautifulSoup(
-            requests.get(
-                'http://whois.arin.net/rest/customer/%s' % customer,
-                headers={'User-Agent': 'Mozilla/5.0'}
-            ).content)
+        soup = BeautifulSoup(get_cache().fetch('arin', ('customer', customer), self._get_customer, customer))
 
         for tag in soup.findAll('netref'):
             text = '%s-%s' % (tag.get('startaddress'), tag.get('endaddress'))
@@ -30,19 +53,9 @@ class IG_Network_Arin(Task):
         """
         Main function
         """
-        results = []
-
-        soup = BeautifulSoup(
-            requests.post(
-                'http://whois.arin.net/ui/query.do',
-                headers={'User-Agent': 'Mozilla/5.0'},
-                params={
-                    'xslt': 'http://whois.arin.net/ui/arin.xsl',
-                    'flushCache': 'false',
-                    'queryinput': self.target,
-                    'whoisSubmitButton': ''
-                }
-            ).content)
+        results = Deduplicator()
+
+        soup = BeautifulSoup(get_cache().fetch('arin', ('query', self.target), self._query, self.target))
 
         for th in soup.findAll('th', attrs={'colspan': '2'}):
             if th.text == 'Customers':
@@ -53,8 +66,7 @@ class IG_Network_Arin(Task):
 
                 while True:
                     for result in self._extract_networks_from_customer(next_str.text):
-                        if result not in results:
-                            results.append(result)
+                        if results.add(result):
                             self._write_result(result)
 
                     try:
@@ -72,8 +84,7 @@ class IG_Network_Arin(Task):
                     text = next_str.text
                     result = text.replace(" ", "")
 
-                    if result not in results:
-                        results.append(result)
+                    if results.add(result):
                         self._write_result(result)
 
                     try:
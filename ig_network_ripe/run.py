@@ -3,6 +3,7 @@
 import requests
 from BeautifulSoup import BeautifulSoup
 from core import Task, execute_task
+from core.cache import get_cache
 
 
 class IG_Network_Ripe(Task):
@@ -51,6 +52,25 @@ class IG_Network_Ripe(Task):
         """
         Main function
         """
+        cache = get_cache()
+        results = cache.get("ripe", self.target)
+
+        if results is not None:
+            for text in results:
+                if text not in self.results:
+                    self.results.append(text)
+                    self._write_result(text)
+
+            return
+
+        found = len(self.results)
+        self._search()
+        cache.set("ripe", self.target, self.results[found:])
+
+    def _search(self):
+        """
+        Search inetnums
+        """
         advanced_form_data = {
             "home_search": "home_search",
             "home_search:searchform_q:": "",
@@ -4,6 +4,7 @@ import dns.resolver
 import dns.query
 import dns.zone
 from core import Task, execute_task
+from core.dedupe import Deduplicator
 
 
 class IG_Subdomain_AXFR(Task):
@@ -21,7 +22,7 @@ class IG_Subdomain_AXFR(Task):
         if self.host.startswith("www."):
             self.host = self.host[4:]
 
-        results = []
+        results = Deduplicator()
 
         try:
             answers = dns.resolver.query(self.host, "NS")
@@ -37,9 +38,8 @@ class IG_Subdomain_AXFR(Task):
                         if k[0] not in ["@", "*"]:
                             subdomain = ".".join([k, self.host])
 
-                            if subdomain not in results:
+                            if results.add(subdomain):
                                 self._write_result(subdomain)
-                                results.append(subdomain)
 
                 except Exception, e:
                     continue
@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
-from socket import gethostbyname
-from dns.resolver import Resolver
 import string
 import itertools
 from core import Task, execute_task
+from core.resolver import get_resolver
 
 
 class IG_Subdomain_Bruteforce(Task):
@@ -11,6 +10,7 @@ class IG_Subdomain_Bruteforce(Task):
     Get subdomains
     """
     TEST_TIMEOUT = 60 * 60
+    CHECKPOINT = True
 
     def _generate_subdomains(self, level, current_value=""):
         """Recursive subdomain generator"""
@@ -54,32 +54,28 @@ class IG_Subdomain_Bruteforce(Task):
             self.host = self.host[4:]
 
         # collect nameservers
-        r = Resolver()
-        r.lifetime = self.DNS_TIMEOUT
+        r = get_resolver()
+        ns_list = r.nameserver_ips(self.host, self.DNS_TIMEOUT)
 
-        name_servers = r.query(self.host, "NS")
-        name_servers = map(lambda x: str(x), name_servers)
-
-        ns_list = []
-
-        for name_server in name_servers:
-            if name_server[-1] == ".":
-                name_server = name_server[:-1]
+        results = set()
+        position = 0
+        cursor = self._get_cursor()
 
-            ns_list.append(gethostbyname(name_server))
+        if cursor:
+            position = cursor["position"]
+            results.update(cursor["results"])
 
-        r = Resolver()
-        r.lifetime = self.DNS_TIMEOUT
-        r.nameservers = ns_list
+        subdomains = itertools.islice(self.generate_subdomains(min_len, max_len), position, None)
 
-        results = set()
+        for sub in subdomains:
+            self._save_cursor({"position": position, "results": results})
+            position += 1
 
-        for sub in self.generate_subdomains(min_len, max_len):
             domain = "%s.%s" % (sub, self.host)
 
             for record in ("A", "CNAME"):
                 try:
-                    records = r.query(domain, record)
+                    records = r.query(domain, record, ns_list, self.DNS_TIMEOUT)
 
                     if records:
                         if sub not in results:
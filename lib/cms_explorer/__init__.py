@@ -13,29 +13,35 @@ _CMS_LIST = (
 _CMS_EXPLORER_PATH = os.path.join(os.path.dirname(__file__), "cms-explorer")
 
 
-def get_cms_type(url):
+def get_cms_type(url, check=None):
     """
     Returns (
         success/failure of CMS-Explorer call: bool,
         type of CMS for url: string
     )
+    CMS types are checked concurrently, check is called while waiting (e.g. Task._check_stop)
     """
-    with call.cd(_CMS_EXPLORER_PATH):
-        for cms in _CMS_LIST:
-            res, out = call.call([
+    results = call.ProcessPool(len(_CMS_LIST)).map(
+        [
+            [
                 "perl",
                 "cms-explorer.pl",
                 "-url", url,
                 "-type", cms,
                 "-verbosity", "1"
-            ])
+            ] for cms in _CMS_LIST
+        ],
+        check=check,
+        cwd=_CMS_EXPLORER_PATH
+    )
 
-            if not res:
-                return False, ""
+    for cms, (res, out) in zip(_CMS_LIST, results):
+        if not res:
+            return False, ""
 
-            if out.find("Installed:") >= 0:
-                output = "%s Detected\n%s" % ( cms.capitalize(), out )
-                return True, output
+        if out.find("Installed:") >= 0:
+            output = "%s Detected\n%s" % ( cms.capitalize(), out )
+            return True, output
 
     return True, "Nothing found."
 
@@ -1,21 +1,26 @@
 # -*- coding: utf-8 -*-
 
-import re
-from threading import Thread, Event
+from threading import Thread, Event, Lock
 from sys import argv, exit, stdout
 from os import killpg, getpgrp
-from os.path import isdir
+from os.path import isdir, exists
 from signal import SIGTERM
 from socket import inet_aton
-from time import sleep
-from lxml import etree
+from time import sleep, time
 from error import NotEnoughArguments, TaskTimeout, NoDataReturned, InvalidTargetFile
-from Queue import Queue
+from output import ResultSink, ResultWriter
+from targets import TargetList, TargetQueue
+from scheduler import Scheduler
 from cStringIO import StringIO
-from netaddr import IPNetwork, IPRange
+from collections import deque
 
 SANDBOX_IP = "192.168.66.66"
-target_queue = Queue()
+
+# set by core.runner to collect task classes instead of running them
+_task_loader = None
+
+# set by execute_task if the task is profiled
+_profiler = None
 
 
 class ResultTable(object):
@@ -44,26 +49,102 @@ class ResultTable(object):
         """
         self._rows.append(row)
 
-    def render(self):
+    def _render_columns(self, parent=None):
         """
-        Render to tags
+        Render columns tag
         """
-        table = etree.Element(self.TAG_MAIN)
-        columns = etree.SubElement(table, self.TAG_COLUMNS)
+        from lxml import etree
+
+        if parent is None:
+            columns = etree.Element(self.TAG_COLUMNS)
+        else:
+            columns = etree.SubElement(parent, self.TAG_COLUMNS)
 
         for column in self._columns:
             etree.SubElement(columns, self.TAG_COLUMN, name=column['name'], width=unicode(column['width']))
 
-        for row in self._rows:
-            row_element = etree.SubElement(table, self.TAG_ROW)
+        return columns
+
+    def _render_row(self, row, parent=None):
+        """
+        Render row tag
+        """
+        from lxml import etree
+
+        if parent is None:
+            row_element = etree.Element(self.TAG_ROW)
+        else:
+            row_element = etree.SubElement(parent, self.TAG_ROW)
+
+        for cell in row:
+            cell_element = etree.SubElement(row_element, self.TAG_CELL)
+            cell_element.text = cell
 
-            for cell in row:
-                cell_element = etree.SubElement(row_element, self.TAG_CELL)
-                cell_element.text = cell
+        return row_element
+
+    def render(self):
+        """
+        Render to tags
+        """
+        from lxml import etree
+
+        table = etree.Element(self.TAG_MAIN)
+        self._render_columns(table)
+
+        for row in self._rows:
+            self._render_row(row, table)
 
         return etree.tostring(table)
 
 
+class ResultTableWriter(ResultTable):
+    """
+    Result table which writes rows to the stream as they are added,
+    the output is identical to Task._write_result(ResultTable.render())
+    """
+
+    def __init__(self, stream, columns):
+        """
+        Constructor
+        """
+        from lxml import etree
+
+        super(ResultTableWriter, self).__init__(columns)
+
+        self._stream = stream
+        self._file_context = etree.xmlfile(stream)
+        self._file = self._file_context.__enter__()
+        self._table_context = self._file.element(self.TAG_MAIN)
+        self._table_context.__enter__()
+        self._file.write(self._render_columns())
+
+    def add_row(self, row):
+        """
+        Write row
+        """
+        self._file.write(self._render_row(row))
+
+    def render(self):
+        """
+        Rows are not kept, so the table can't be rendered
+        """
+        raise Exception("Streaming table can't be rendered.")
+
+    def close(self):
+        """
+        Finish the table
+        """
+        self._table_context.__exit__(None, None, None)
+        self._file_context.__exit__(None, None, None)
+        self._stream.write('\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
 class Task(Thread):
     """
     Base class for all tasks
@@ -79,7 +160,23 @@ class Task(Thread):
     SYSTEM_LIBRARY_PATH = "/opt/gtta/scripts/system/lib"
     USER_LIBRARY_PATH = "/opt/gtta/scripts/lib"
     MULTITHREADED = False
-    THREAD_COUNT = 10
+    THREAD_COUNT = 10  # initial number of worker threads
+    MIN_THREAD_COUNT = 2
+    MAX_THREAD_COUNT = 50
+    TARGET_TIMEOUT = None  # per-target deadline in multithreaded mode
+    SCALE_INTERVAL = 5  # how often the number of worker threads is adjusted
+    MAX_ERROR_RATE = 0.2  # worker count is reduced if more targets fail
+    LATENCY_TOLERANCE = 1.5  # worker count is reduced if targets get slower
+    QUEUE_SIZE = 100  # max targets waiting for worker threads
+    ASYNC = False  # run targets as cooperative greenlets (requires gevent)
+    ASYNC_CONCURRENCY = 500  # max targets in flight in ASYNC mode
+    ASYNC_STOP_INTERVAL = 0.5  # how often ASYNC mode checks if the task was stopped
+    PROCESSES = 0  # run targets in a pool of N processes (for CPU-bound tasks)
+    PROCESS_BACKLOG = 4  # targets waiting per pool process
+    PROCESS_POLL_INTERVAL = 0.5  # how often the pool mode checks if the task was stopped
+    CHECKPOINT = False  # save progress next to the result file and resume interrupted runs
+    COMMAND_TIMEOUT = None  # deadline of external commands started with _call
+    COMMAND_MAX_OUTPUT = 16 * 1024 * 1024  # external command is killed if it writes more, same as call.MAX_OUTPUT
     TEST_TARGETS = ["google.com"]
 
     def __init__(self, worker=False):
@@ -102,6 +199,16 @@ class Task(Thread):
         self.produced_output = False
         self._stop = Event()
         self._result = None
+        self._result_path = None
+        self._writer = None
+        self._sink = None
+        self._queue = None
+        self._scheduler = None
+        self._checkpoint = None
+        self._shard = None
+        self._dedupers = {}
+        self._dedupers_lock = Lock()
+        self._processed = 0
         self._worker = worker
 
     def _check_stop(self):
@@ -121,35 +228,28 @@ class Task(Thread):
         self.produced_output = True
 
         if self._result:
-            self._result.write(str.encode('utf-8'))
-            self._result.write('\n')
-            self._result.flush()
+            self._result.write(str.encode('utf-8') + '\n')
 
         else:
             print str.encode('utf-8')
             stdout.flush()
 
     def _expand_targets(self):
-        targets = []
-
-        for target in self.targets:
-            # IP network
-            if re.match('^\d+\.\d+\.\d+\.\d+\/(3[0-2]|2[0-9]{1}|[01]?[0-9])$', target):
-                for ip in IPNetwork(target):
-                    targets.append('%s' % ip)
-
-            # IP range
-            elif re.match('^\d+\.\d+\.\d+\.\d+\s*\-\s*\d+\.\d+\.\d+\.\d+$', target):
-                target = target.replace(" ", "")
-                scope = target.split('-')
+        """
+        Expand IP networks and IP ranges lazily
+        """
+        self.targets = TargetList(self.targets, self._shard)
 
-                for ip in IPRange(scope[0], scope[1]):
-                    targets.append('%s' % ip)
+    def progress(self):
+        """
+        Get the number of processed targets and the total number of targets
+        """
+        processed = self._processed
 
-            else:
-                targets.append(target)
+        if self._queue:
+            processed = self._queue.processed
 
-        self.targets = targets
+        return processed, len(self.targets or [])
 
     def stop(self):
         """
@@ -157,12 +257,46 @@ class Task(Thread):
         """
         self._stop.set()
 
+    def _result_table(self, columns):
+        """
+        Create result table which is written to the result as rows are added
+        """
+        self.produced_output = True
+        return ResultTableWriter(self._result or stdout, columns)
+
+    def _unique(self, name="results"):
+        """
+        Get named set of seen items for the whole task run, shared by all workers
+        (pool processes have their own sets)
+        """
+        from dedupe import Deduplicator
+
+        with self._dedupers_lock:
+            if name not in self._dedupers:
+                self._dedupers[name] = Deduplicator()
+
+            return self._dedupers[name]
+
+    def flush(self):
+        """
+        Write buffered results
+        """
+        if self._result:
+            self._result.flush()
+
+        stdout.flush()
+
     def parse_input(self):
         """
         Parses input arguments
         """
+        import shard
+
         self.arguments = []
 
+        # the node processes only its shard of the targets
+        self._shard = shard.get_shard(argv)
+
         if len(argv) < 3:
             raise NotEnoughArguments('At least 2 command line arguments should be specified.')
 
@@ -187,6 +321,8 @@ class Task(Thread):
 
         if self.EXPAND_TARGETS:
             self._expand_targets()
+        elif self._shard:
+            self.targets = [target for target in self.targets if target in self._shard]
 
         self.proto = lines[1]
 
@@ -214,7 +350,8 @@ class Task(Thread):
             self.timeout = self.DEFAULT_TIMEOUT
 
         # open output file
-        self._result = open(argv[2], 'w')
+        self._result_path = argv[2]
+        self._open_result(argv[2])
 
         # parse the remaining arguments
         for arg in argv[3:]:
@@ -226,6 +363,93 @@ class Task(Thread):
             else:
                 self.arguments.append(arg)
 
+    def _open_result(self, path):
+        """
+        Open result file, the output of an interrupted run is kept if its progress is resumed
+        """
+        if not self.CHECKPOINT:
+            self._writer = ResultWriter(open(path, 'w'))
+            self._result = self._writer
+            return
+
+        from checkpoint import Checkpoint, input_key
+
+        checkpoint = Checkpoint(path + '.state', input_key(argv))
+
+        if exists(path) and checkpoint.load():
+            # drop the output written after the last save, it will be produced again
+            stream = open(path, 'r+b')
+            stream.truncate(checkpoint.offset)
+            stream.seek(checkpoint.offset)
+
+            if checkpoint.offset:
+                self.produced_output = True
+
+        else:
+            stream = open(path, 'w')
+
+        self._writer = ResultWriter(stream)
+        self._result = self._writer
+        self._checkpoint = checkpoint
+        self._checkpoint.stream = self._result
+
+    def _pending_targets(self):
+        """
+        Iterate targets which are not completed yet
+        """
+        for target in self.targets:
+            if self._checkpoint and self._checkpoint.is_done(target):
+                continue
+
+            yield target
+
+    def _commit_target(self, target, output=None, completed=True):
+        """
+        Write target output and save progress
+        """
+        checkpoint = self._checkpoint
+
+        if not checkpoint:
+            if output:
+                self._sink.write(output)
+
+            return
+
+        with checkpoint.lock:
+            if output:
+                self._sink.write(output)
+
+            if completed:
+                checkpoint.target_done(target)
+
+            if checkpoint.due():
+                checkpoint.save()
+
+    def _get_cursor(self):
+        """
+        Get position of the current target saved by the interrupted run (None if there is none)
+        """
+        if self._checkpoint and not self._sink:
+            return self._checkpoint.get_cursor(self.target)
+
+        return None
+
+    def _save_cursor(self, cursor):
+        """
+        Save position of the current target, only single-threaded tasks write the
+        target output directly to the result file, so other modes resume whole targets
+        """
+        checkpoint = self._checkpoint
+
+        if not checkpoint or self._sink:
+            return
+
+        with checkpoint.lock:
+            checkpoint.set_cursor(self.target, cursor)
+
+            if checkpoint.due():
+                checkpoint.save()
+
     def _get_library_path(self, library):
         """
         Get library path
@@ -242,6 +466,33 @@ class Task(Thread):
 
         return "%s/%s" % (path, library)
 
+    def _call(self, cmd, stream=False, cwd=None):
+        """
+        Run external command, it's killed when the task is stopped. Output lines are passed
+        to the stream callback as they arrive (stream=True writes them to the result).
+        Returns (status, output), see call.run(), the result notes if the output is partial
+        """
+        import call
+
+        if stream is True:
+            stream = self._write_result
+
+        status, output = call.run(
+            cmd,
+            line_callback=stream or None,
+            timeout=self.COMMAND_TIMEOUT,
+            max_bytes=self.COMMAND_MAX_OUTPUT,
+            check=self._check_stop,
+            cwd=cwd
+        )
+
+        if status == call.TIMED_OUT:
+            self._write_result('Command has timed out, the output is incomplete.')
+        elif status == call.TRUNCATED:
+            self._write_result('Command output is too long, the output is truncated.')
+
+        return status, output
+
     def test(self):
         """
         Test the task
@@ -256,7 +507,10 @@ class Task(Thread):
 
     def _run_target(self, target):
         """Run task for a single target"""
+        import metrics
+
         self.target = target
+        started = time()
 
         try:
             inet_aton(target)
@@ -265,76 +519,256 @@ class Task(Thread):
         except:
             self.host = target
 
-        if self.test_mode:
-            self.test()
-            self.produced_output = True
-        else:
-            self.main(*self.arguments)
+        try:
+            if self.test_mode:
+                self.test()
+                self.produced_output = True
+            else:
+                self.main(*self.arguments)
+
+        finally:
+            metrics.get_metrics().add_target(target, time() - started)
 
     def _run_singlethreaded(self):
         """Run single-threaded task"""
-        map(self._run_target, self.targets)
+        for target in self._pending_targets():
+            self._run_target(target)
+            self._processed += 1
+            self._commit_target(target)
+
+    def _worker_settings(self):
+        """Get settings which are passed to workers"""
+        return {
+            "arguments": self.arguments,
+            "proto": self.proto,
+            "lang": self.lang,
+            "test_mode": self.test_mode,
+        }
+
+    def _create_worker(self):
+        """Create worker task sharing the settings and result stream of this task"""
+        worker = type(self)(worker=True)
+
+        for name, value in self._worker_settings().iteritems():
+            setattr(worker, name, value)
+
+        worker._sink = self._sink
+        worker._queue = self._queue
+        worker._checkpoint = self._checkpoint
+        worker._dedupers = self._dedupers
+        worker._dedupers_lock = self._dedupers_lock
+
+        return worker
+
+    def _run_buffered(self, target):
+        """Run target and write its output to the shared stream as a single block"""
+        self._result = StringIO()
+        completed = True
+
+        try:
+            self._run_target(target)
+
+        except TaskTimeout:
+            completed = False
+            raise
+
+        except Exception, e:
+            self._write_error(e)
+
+        finally:
+            self._commit_target(target, self._result.getvalue(), completed)
+            self._result = self._sink
 
     def _run_multithreaded(self):
         """Run multi-threaded task"""
-        global target_queue
+        self._queue = TargetQueue(self.QUEUE_SIZE)
+
+        # all workers write finished targets into one shared stream
+        self._sink = ResultSink(self._result or stdout)
+        self._result = self._sink
+
+        self._scheduler = Scheduler(self)
+
+        try:
+            self._scheduler.run()
+        finally:
+            self._scheduler.stop()
 
-        map(target_queue.put, self.targets)
+            if self._sink.produced_output:
+                self.produced_output = True
 
-        thread_count = min(self.THREAD_COUNT, len(self.targets))
-        thread_pool = []
+    def _run_worker(self):
+        """Worker thread main function"""
+        # errors raised outside of a target go directly to the shared stream
+        self._result = self._sink
 
-        for i in xrange(thread_count):
-            thread = type(self)(worker=True)
-            thread.arguments = self.arguments
-            thread.proto = self.proto
-            thread.lang = self.lang
-            thread.test_mode = self.test_mode
-            thread.start()
+        while not self._scheduler.retire(self):
+            task = self._queue.get()
 
-            thread_pool.append(thread)
+            if not task:
+                break
 
-        for thread in thread_pool:
-            thread.join(self.timeout)
+            self._scheduler.target_started(self)
+            self._result = StringIO()
+            error = False
+            completed = True
 
-            if thread.isAlive():
-                thread.stop()
+            try:
+                self._run_target(task)
 
-            result = thread.worker_result()
+            except TaskTimeout:
+                # the whole task is stopped
+                if self._scheduler.stopped.isSet():
+                    completed = False
+                    raise
 
-            if result.endswith("\n"):
-                result = result[:-1]
+                self._write_result('Target has timed out: %s' % task)
+                error = True
 
-            self._write_result(result)
+            except Exception, e:
+                self._write_error(e)
+                error = True
 
-    def _run_worker(self):
-        """Worker thread main function"""
-        global target_queue
+            finally:
+                self._commit_target(task, self._result.getvalue(), completed)
+                self._result = self._sink
+                self._scheduler.target_finished(self, error)
+                self._queue.task_done()
 
-        self._result = StringIO()
+    def _run_async(self):
+        """Run task targets as greenlets on a single event loop"""
+        import green
+
+        self._sink = ResultSink(self._result or stdout)
+        self._result = self._sink
+
+        pool = green.Pool(self.ASYNC_CONCURRENCY)
+        workers = set()
+        watcher = green.spawn(self._watch_async, workers)
+
+        try:
+            for target in self._pending_targets():
+                self._check_stop()
+                pool.spawn(self._run_async_target, target, workers)
+
+            pool.join()
+
+        finally:
+            watcher.kill()
+
+            if self._stop.isSet():
+                for worker in list(workers):
+                    worker.stop()
+
+        if self._sink.produced_output:
+            self.produced_output = True
+
+    def _run_async_target(self, target, workers):
+        """Run single target greenlet"""
+        worker = self._create_worker()
+        workers.add(worker)
+
+        try:
+            worker._run_buffered(target)
+
+        except TaskTimeout:
+            pass
+
+        except Exception, e:
+            worker._write_error(e)
+
+        finally:
+            workers.discard(worker)
+            self._processed += 1
+
+            if worker.error:
+                self.error = True
+
+    def _watch_async(self, workers):
+        """Propagate task stop to the running greenlets"""
+        import green
+
+        while not self._stop.isSet():
+            green.sleep(self.ASYNC_STOP_INTERVAL)
+
+        for worker in list(workers):
+            worker.stop()
+
+    def _run_processes(self):
+        """Run task targets in a pool of processes"""
+        import multiprocess
+
+        self._sink = ResultSink(self._result or stdout)
+        self._result = self._sink
+
+        pool = multiprocess.create_pool(self)
+        pending = deque()
+
+        try:
+            for target in self._pending_targets():
+                self._check_stop()
+                pending.append((target, pool.apply_async(multiprocess.run_target, (target,))))
+
+                if len(pending) >= self.PROCESSES * self.PROCESS_BACKLOG:
+                    self._write_process_result(pending.popleft())
+
+            while pending:
+                self._write_process_result(pending.popleft())
+
+        finally:
+            # kills the pool processes if the task was stopped
+            pool.terminate()
+            pool.join()
+
+    def _write_process_result(self, pending):
+        """Wait for the pool process result and write it"""
+        import metrics
+        import multiprocess
+
+        target, result = pending
 
         while True:
             try:
-                task = target_queue.get(block=False)
-            except:
-                task = None
-
-            if not task:
+                output, produced_output, error, process_metrics = result.get(self.PROCESS_POLL_INTERVAL)
                 break
+            except multiprocess.TimeoutError:
+                self._check_stop()
+
+        self._check_stop()
+        self._commit_target(target, output)
+        self._processed += 1
 
-            self._run_target(task)
+        metrics.get_metrics().merge(process_metrics)
 
-    def worker_result(self):
-        """Get worker result"""
-        if type(self._result) == file:
-            return ""
+        if produced_output:
+            self.produced_output = True
 
-        return self._result.getvalue()
+        if error:
+            self.error = True
+
+    def _write_error(self, e):
+        """Write exception to the result"""
+        error_str = e.__class__.__name__
+
+        if str(e):
+            error_str += ': %s' % str(e)
+
+        self._write_result(error_str)
+        self.error = True
 
     def run(self):
         """
         Run a task
         """
+        if _profiler:
+            _profiler.run(self._run_task)
+        else:
+            self._run_task()
+
+    def _run_task(self):
+        """
+        Run task or worker
+        """
         try:
             # run worker for multithreaded
             if self._worker:
@@ -344,7 +778,11 @@ class Task(Thread):
             if self.test_mode:
                 self.targets = self.TEST_TARGETS
 
-            if self.MULTITHREADED:
+            if self.PROCESSES:
+                self._run_processes()
+            elif self.ASYNC:
+                self._run_async()
+            elif self.MULTITHREADED:
                 self._run_multithreaded()
             else:
                 self._run_singlethreaded()
@@ -353,28 +791,51 @@ class Task(Thread):
             pass
 
         except Exception, e:
-            error_str = e.__class__.__name__
-
-            if str(e):
-                error_str += ': %s' % str(e)
-
-            self._write_result(error_str)
-            self.error = True
+            self._write_error(e)
 
 
 def execute_task(task_class):
     """
     Executes task and controls its execution
     """
+    global _profiler
+    import metrics
+    import profiler
+
+    if _task_loader:
+        _task_loader(task_class)
+        return
+
     task = task_class()
 
-    if len(argv) == 2 and argv[1] == "--test":
-        task.test_mode = True
+    if task.ASYNC:
+        # patch blocking calls before any task code runs
+        import green
+        green.patch()
+
+    task_metrics = metrics.get_metrics()
+
+    if metrics.enabled():
+        metrics.instrument()
+
+    status = None
 
     try:
+        # profiler arguments are removed before the input is parsed
+        profile_mode = profiler.get_mode(argv)
+
+        if profile_mode:
+            _profiler = profiler.create_profiler(profile_mode)
+            _profiler.start()
+
+        if len(argv) == 2 and argv[1] == "--test":
+            task.test_mode = True
+
         if not task.test_mode:
-            task.parse_input()
+            with task_metrics.phase("parse_input"):
+                task.parse_input()
 
+        started = time()
         task.start()
 
         if task.test_mode:
@@ -386,35 +847,83 @@ def execute_task(task_class):
             timeout = None
 
         task.join(timeout)
+        task_metrics.add_phase("run", time() - started)
 
         if task.isAlive():
+            if task._checkpoint:
+                task._checkpoint.close()
+
             task.stop()
             raise TaskTimeout
 
+        # all targets are processed, nothing to resume
+        if task._checkpoint:
+            task._checkpoint.remove()
+
         if not task.produced_output:
             raise NoDataReturned
 
     except TaskTimeout:
-        task._write_result('Task has timed out.')
+        status = 'Task has timed out.'
 
     except NoDataReturned:
-        task._write_result('No data returned.')
+        status = 'No data returned.'
 
     except Exception, e:
-        output = e.__class__.__name__
+        status = e.__class__.__name__
 
         if str(e):
-            output += ': %s' % str(e)
+            status += ': %s' % str(e)
 
-        task._write_result(output)
         task.error = True
 
+    # status messages are not task output, empty shards are skipped when merged
+    produced_output = task.produced_output
+    task._write_result(status)
+
+    with task_metrics.phase("flush"):
+        task.flush()
+
+        # the flusher thread is stopped, so it's not killed by the interpreter shutdown
+        if task._writer and not task.isAlive():
+            task._writer.close()
+
+    # profile is written next to the result file
+    if _profiler:
+        _profiler.stop()
+
+        if task._result_path:
+            try:
+                _profiler.write(task._result_path + _profiler.SUFFIX)
+            except (IOError, OSError):
+                pass
+
+    # shard description is used to merge the results of all shards
+    if task._shard and task._result_path:
+        import shard
+        from checkpoint import input_key
+
+        try:
+            shard.write_info(task._result_path, task._shard, input_key(argv), produced_output)
+        except (IOError, OSError):
+            pass
+
+    # metrics are written next to the result file
+    if task._result_path and metrics.enabled():
+        try:
+            task_metrics.write(task._result_path + ".metrics.json")
+        except (IOError, OSError):
+            pass
+
     # if background task is still alive, commit a suicide
     if task.isAlive():
         # sleep before flush
         sleep(5)
-        stdout.flush()
+        task.flush()
+
+        import call
 
+        call.kill_all()
         group_id = getpgrp()
         killpg(group_id, SIGTERM)
 
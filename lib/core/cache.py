@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+import json
+import sqlite3
+from errno import EEXIST
+from os import environ, getpid, getuid, lstat, makedirs, mkdir
+from os.path import dirname, isdir, join
+from stat import S_ISDIR
+from tempfile import gettempdir
+from threading import Lock
+from time import time
+from metrics import get_metrics
+
+DAY = 60 * 60 * 24
+
+# cache lifetime of external data sources
+SOURCE_TTL = {
+    "whois": 7 * DAY,
+    "cymru": DAY,
+    "arin": 7 * DAY,
+    "ripe": 7 * DAY,
+    "viewdns": DAY,
+    "spyonweb": DAY,
+}
+
+_MISSING = object()
+
+
+def private_dir(name):
+    """
+    Get directory in the temp directory which is private to the current user (mode 0700),
+    raises OSError if it's owned by another user or other users can access it
+    """
+    base = join(gettempdir(), "gtta-%d" % getuid())
+
+    try:
+        mkdir(base, 0700)
+    except OSError, e:
+        if e.errno != EEXIST:
+            raise
+
+    info = lstat(base)
+
+    if not S_ISDIR(info.st_mode) or info.st_uid != getuid() or info.st_mode & 077:
+        raise OSError("Insecure directory: %s" % base)
+
+    path = join(base, name)
+
+    if not isdir(path):
+        makedirs(path, 0700)
+
+    return path
+
+
+class LookupCache(object):
+    """
+    Persistent SQLite cache for slow external lookups, values are stored as JSON
+    """
+    DEFAULT_TTL = DAY
+    MAX_SIZE = 256 * 1024 * 1024  # max total size of cached values
+    EVICT_INTERVAL = 100  # check cache size every N writes
+    LOCK_TIMEOUT = 30  # wait for other processes holding the database lock
+
+    def __init__(self, path=None, bypass=False):
+        """
+        Constructor, the database is created in the private directory of the user if path is not set
+        """
+        self.path = path
+        self.bypass = bypass
+        self._lock = Lock()
+        self._connection = None
+        self._pid = None
+        self._writes = 0
+
+    def _connect(self):
+        """
+        Get database connection (connections are not shared with forked processes)
+        """
+        if self._connection and self._pid == getpid():
+            return self._connection
+
+        if not self.path:
+            self.path = join(private_dir("cache"), "lookup-cache.db")
+
+        if not isdir(dirname(self.path)):
+            makedirs(dirname(self.path))
+
+        connection = sqlite3.connect(self.path, timeout=self.LOCK_TIMEOUT, check_same_thread=False)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS lookup ("
+            "source TEXT, query TEXT, value TEXT, size INTEGER, expires REAL, accessed REAL, "
+            "PRIMARY KEY (source, query))"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS lookup_accessed ON lookup (accessed)")
+        connection.commit()
+
+        self._connection = connection
+        self._pid = getpid()
+
+        return connection
+
+    def _key(self, query):
+        """
+        Query key
+        """
+        if isinstance(query, (list, tuple)):
+            query = "\t".join(map(unicode, query))
+
+        return unicode(query)
+
+    def get(self, source, query, default=None):
+        """
+        Get cached value
+        """
+        if self.bypass:
+            return default
+
+        key = self._key(query)
+        now = time()
+        row = None
+        value = default
+
+        try:
+            with self._lock:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT value, expires FROM lookup WHERE source = ? AND query = ?",
+                    (source, key)
+                ).fetchone()
+
+                if not row:
+                    return default
+
+                if row[1] < now:
+                    connection.execute("DELETE FROM lookup WHERE source = ? AND query = ?", (source, key))
+                    connection.commit()
+                    return default
+
+                connection.execute(
+                    "UPDATE lookup SET accessed = ? WHERE source = ? AND query = ?",
+                    (now, source, key)
+                )
+                connection.commit()
+
+            value = json.loads(row[0])
+
+        # values of old cache versions are not JSON
+        except (sqlite3.Error, OSError, TypeError, ValueError):
+            row = None
+
+        finally:
+            get_metrics().incr("cache_hits" if row and row[1] >= now else "cache_misses")
+
+        return value
+
+    def set(self, source, query, value, ttl=None):
+        """
+        Store value (strings, numbers, lists and dicts; tuples are returned as lists,
+        strings as unicode), values which can't be stored as JSON are not cached
+        """
+        if ttl is None:
+            ttl = SOURCE_TTL.get(source, self.DEFAULT_TTL)
+
+        try:
+            data = json.dumps(value)
+        except (TypeError, ValueError, UnicodeError):
+            return
+
+        now = time()
+
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO lookup VALUES (?, ?, ?, ?, ?, ?)",
+                    (source, self._key(query), data, len(data), now + ttl, now)
+                )
+                connection.commit()
+
+                self._writes += 1
+
+                if self._writes % self.EVICT_INTERVAL == 0:
+                    self._evict(connection)
+
+        except (sqlite3.Error, OSError):
+            pass
+
+    def _evict(self, connection):
+        """
+        Remove expired and least recently used values if the cache is too big
+        """
+        connection.execute("DELETE FROM lookup WHERE expires < ?", (time(),))
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM lookup").fetchone()[0]
+
+        if total > self.MAX_SIZE:
+            # drop the least recently used values until the cache is 10% below the limit
+            excess = total - self.MAX_SIZE * 9 / 10
+            rows = connection.execute("SELECT source, query, size FROM lookup ORDER BY accessed")
+
+            evicted = []
+
+            for source, query, size in rows:
+                if excess <= 0:
+                    break
+
+                evicted.append((source, query))
+                excess -= size
+
+            connection.executemany("DELETE FROM lookup WHERE source = ? AND query = ?", evicted)
+
+        connection.commit()
+
+    def fetch(self, source, query, func, *args, **kwargs):
+        """
+        Get cached value or call func(*args, **kwargs) and cache its result (exceptions are not cached)
+        """
+        value = self.get(source, query, _MISSING)
+
+        if value is _MISSING:
+            value = func(*args, **kwargs)
+            self.set(source, query, value)
+
+        return value
+
+
+_cache = None
+_cache_lock = Lock()
+
+
+def get_cache():
+    """
+    Get lookup cache shared by all tasks of the process,
+    GTTA_CACHE_PATH sets the database path (the private directory of the user by default)
+    and GTTA_NO_CACHE=1 bypasses cached values
+    """
+    global _cache
+
+    with _cache_lock:
+        if not _cache:
+            _cache = LookupCache(
+                environ.get("GTTA_CACHE_PATH"),
+                environ.get("GTTA_NO_CACHE") == "1"
+            )
+
+    return _cache
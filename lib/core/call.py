@@ -2,6 +2,22 @@
 
 import subprocess
 import os
+import signal
+from select import select
+from threading import BoundedSemaphore, Lock, Thread
+from time import time
+
+POLL_INTERVAL = 0.5  # how often a running process is checked (deadline, stop)
+READ_SIZE = 64 * 1024
+MAX_OUTPUT = 16 * 1024 * 1024  # default output cap, the process is killed if it writes more
+
+# run() status of the killed processes, the output is partial (true values, the process was started)
+TIMED_OUT = "timed out"
+TRUNCATED = "truncated"
+
+# processes started by run(), they have their own process groups
+_processes = set()
+_processes_lock = Lock()
 
 try:
     from subprocess import check_output
@@ -15,17 +31,175 @@ except ImportError:
 
         return (out or '') + (err or '')
 
-def call(cmd):
+
+def _kill(process):
+    """
+    Kill the process group of the process
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+    process.wait()
+
+
+def run(cmd, line_callback=None, timeout=None, max_bytes=MAX_OUTPUT, check=None, cwd=None):
     """
-    Calls command and returns (Success: Bool, output)
+    Runs command in its own process group and reads its output (stdout & stderr) as it arrives.
+    Output lines are passed to line_callback if it's set, otherwise the output is collected.
+    The process group is killed when the timeout expires, the output exceeds max_bytes
+    or check raises an exception (e.g. Task._check_stop), the exception is re-raised.
+    Returns (status, output): True if the process has finished, False if it can't be started,
+    TIMED_OUT or TRUNCATED if it was killed. Output is empty if line_callback is set
     """
     try:
-        return True, check_output(cmd, stderr=subprocess.STDOUT)
-    except subprocess.CalledProcessError as err:
-        return True, err.output
-    except OSError as err:
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=cwd,
+            close_fds=True,
+            preexec_fn=os.setsid
+        )
+    except OSError:
         return False, ''
 
+    with _processes_lock:
+        _processes.add(process)
+
+    deadline = time() + timeout if timeout else None
+    fd = process.stdout.fileno()
+    output = []
+    pending = ''
+    size = 0
+    status = True
+
+    try:
+        while True:
+            if check:
+                check()
+
+            wait = POLL_INTERVAL
+
+            if deadline:
+                wait = deadline - time()
+
+                if wait <= 0:
+                    status = TIMED_OUT
+                    break
+
+                wait = min(wait, POLL_INTERVAL)
+
+            if not select([fd], [], [], wait)[0]:
+                continue
+
+            data = os.read(fd, READ_SIZE)
+
+            if not data:
+                break
+
+            if max_bytes:
+                data = data[:max_bytes - size]
+
+            size += len(data)
+
+            if line_callback:
+                lines = (pending + data).split('\n')
+                pending = lines.pop()
+
+                for line in lines:
+                    line_callback(line)
+            else:
+                output.append(data)
+
+            if max_bytes and size >= max_bytes:
+                status = TRUNCATED
+                break
+
+        if pending and line_callback:
+            line_callback(pending)
+
+    finally:
+        if process.poll() is None:
+            _kill(process)
+
+        process.stdout.close()
+
+        with _processes_lock:
+            _processes.discard(process)
+
+    return status, ''.join(output)
+
+
+def kill_all():
+    """
+    Kill all running processes (they are not in the task process group)
+    """
+    with _processes_lock:
+        processes = list(_processes)
+
+    for process in processes:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def call(cmd, **kwargs):
+    """
+    Calls command and returns (status, output),
+    keyword arguments are passed to run()
+    """
+    return run(cmd, **kwargs)
+
+
+class ProcessPool(object):
+    """
+    Runs commands concurrently, at most size processes at a time
+    """
+
+    def __init__(self, size=4):
+        """
+        Constructor
+        """
+        self._semaphore = BoundedSemaphore(size)
+
+    def run(self, cmd, **kwargs):
+        """
+        Run command when a pool slot is free, see run()
+        """
+        with self._semaphore:
+            return run(cmd, **kwargs)
+
+    def map(self, cmds, **kwargs):
+        """
+        Run all commands, returns the list of (status, output) in the command order.
+        If any command raised an exception, it's re-raised when all commands are finished
+        """
+        results = [None] * len(cmds)
+        errors = []
+
+        def worker(index, cmd):
+            try:
+                results[index] = self.run(cmd, **kwargs)
+            except Exception, e:
+                errors.append(e)
+
+        threads = [Thread(target=worker, args=(i, cmd)) for i, cmd in enumerate(cmds)]
+
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+        return results
+
 
 def cd(path):
     """
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+import json
+from hashlib import sha1
+from os import rename, remove
+from os.path import abspath, exists, isfile
+from threading import RLock
+from time import time
+
+
+def input_key(args):
+    """
+    Get key of the task inputs (script, target file and arguments), a checkpoint
+    is only resumed by a run with the same inputs
+    """
+    key = sha1(abspath(args[0]))
+
+    for arg in args[1:2] + args[3:]:
+        key.update("\0")
+
+        if isfile(arg):
+            with open(arg, "rb") as f:
+                key.update(f.read())
+        else:
+            key.update(arg)
+
+    return key.hexdigest()
+
+
+class Checkpoint(object):
+    """
+    Task progress saved next to the result file: cursor of the current target and
+    the result file size it corresponds to. Completed targets are appended to a separate
+    log, so a save writes only the targets completed since the previous one
+    """
+    SAVE_INTERVAL = 10  # seconds between saves
+    LOG_SUFFIX = ".done"
+
+    def __init__(self, path, key):
+        """
+        Constructor
+        """
+        self.path = path
+        self.log_path = path + self.LOG_SUFFIX
+        self.key = key
+        self.lock = RLock()
+        self.offset = 0
+        self.stream = None  # result writer, set by the task
+        self._done = set()
+        self._new = []  # targets completed since the last save
+        self._log = None
+        self._log_size = 0  # valid part of the log, written after the last save is not trusted
+        self._target = None
+        self._cursor = None
+        self._saved = time()
+        self._closed = False
+
+    def load(self):
+        """
+        Load saved progress, returns False if there is no progress for the same inputs
+        """
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (IOError, ValueError):
+            return False
+
+        if not isinstance(state, dict) or state.get("key") != self.key or "log_size" not in state:
+            return False
+
+        try:
+            with open(self.log_path, "rb") as f:
+                log = f.read(state["log_size"])
+        except IOError:
+            return False
+
+        if len(log) != state["log_size"]:
+            return False
+
+        self.offset = state["offset"]
+        self._done = set(log.splitlines())
+        self._log_size = state["log_size"]
+        self._target = state["target"]
+        self._cursor = state["cursor"]
+
+        return True
+
+    def _key(self, target):
+        """
+        Target as it's written to the log
+        """
+        if isinstance(target, unicode):
+            target = target.encode("utf-8")
+
+        return target
+
+    def is_done(self, target):
+        """
+        Check if target was completed by the interrupted run
+        """
+        return self._key(target) in self._done
+
+    def target_done(self, target):
+        """
+        Mark target as completed, its output must already be written to the result stream
+        """
+        with self.lock:
+            self._done.add(self._key(target))
+            self._new.append(self._key(target))
+
+            if target == self._target:
+                self._target = None
+                self._cursor = None
+
+    def get_cursor(self, target):
+        """
+        Get saved cursor of the target
+        """
+        with self.lock:
+            if target == self._target:
+                return self._cursor
+
+        return None
+
+    def set_cursor(self, target, cursor):
+        """
+        Set cursor of the target, the target output written so far must match it.
+        Cursor is serialized to JSON when the progress is saved, so it may reference live objects
+        """
+        with self.lock:
+            self._target = target
+            self._cursor = cursor
+
+    def due(self):
+        """
+        Check if it's time to save the progress
+        """
+        return not self._closed and time() - self._saved >= self.SAVE_INTERVAL
+
+    def close(self):
+        """
+        Stop saving progress, the task is stopped and its further output is not trusted
+        """
+        with self.lock:
+            self._closed = True
+
+    def _write_log(self):
+        """
+        Append targets completed since the last save to the log
+        """
+        if not self._log:
+            # the log of a resumed run is continued after its valid part
+            self._log = open(self.log_path, "r+b" if self._log_size else "wb")
+            self._log.truncate(self._log_size)
+            self._log.seek(self._log_size)
+
+        if self._new:
+            self._log.write("".join("%s\n" % target for target in self._new))
+            self._log.flush()
+            self._log_size = self._log.tell()
+            self._new = []
+
+    def save(self):
+        """
+        Flush the result stream and save progress
+        """
+        with self.lock:
+            self.offset = self.stream.tell()
+            self._write_log()
+
+            state = {
+                "key": self.key,
+                "offset": self.offset,
+                "log_size": self._log_size,
+                "target": self._target,
+                "cursor": self._cursor,
+            }
+
+            # replaced atomically, so a killed task never leaves a broken file
+            temp_path = self.path + ".tmp"
+
+            # cursors may contain sets
+            with open(temp_path, "w") as f:
+                json.dump(state, f, default=list)
+
+            rename(temp_path, self.path)
+            self._saved = time()
+
+    def remove(self):
+        """
+        Task is finished, progress is not needed
+        """
+        if self._log:
+            self._log.close()
+            self._log = None
+
+        for path in (self.path, self.log_path):
+            if exists(path):
+                remove(path)
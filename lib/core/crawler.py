@@ -1,8 +1,17 @@
 # -*- coding: utf-8 -*-
 
+import codecs
 import re
+import urllib
 import urlparse
-import requests
+from collections import deque
+from Queue import Queue, Empty
+from threading import Thread
+from time import time
+from crawlstore import body_hash, get_crawl_store
+import http
+import sitemap
+import metrics
 
 
 def have_same_base(this, that):
@@ -15,18 +24,180 @@ def have_same_base(this, that):
     return this == that
 
 
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# session identifiers and tracking parameters, they don't change the page
+IGNORED_PARAMS = (
+    "phpsessid",
+    "jsessionid",
+    "aspsessionid",
+    "sessionid",
+    "session_id",
+    "sid",
+    "cfid",
+    "cftoken",
+    "utm_source",
+    "utm_medium",
+    "utm_campaign",
+    "utm_term",
+    "utm_content",
+)
+
+
+def canonicalize(url, ignored_params=IGNORED_PARAMS):
+    """
+    Canonical form of http(s) url: lowercase scheme and host, no default port, fragment,
+    path parameters and ignored query parameters, query parameters are sorted
+    """
+    scheme, netloc, path, query, _ = urlparse.urlsplit(url)
+    scheme = scheme.lower()
+
+    if scheme not in DEFAULT_PORTS:
+        return url
+
+    netloc = netloc.lower()
+
+    if netloc.endswith(":%d" % DEFAULT_PORTS[scheme]):
+        netloc = netloc.rsplit(":", 1)[0]
+
+    # ";jsessionid=..." path parameters
+    path = path.split(";", 1)[0] or "/"
+
+    params = [
+        param for param in query.split("&")
+        if param and urllib.unquote_plus(param.split("=", 1)[0]).lower() not in ignored_params
+    ]
+
+    params.sort()
+
+    return urlparse.urlunsplit((scheme, netloc, path, "&".join(params), ""))
+
+
+def path_template(url):
+    """
+    Path template of the url: numbers and long hex identifiers in the path are replaced
+    with placeholders and only the names of query parameters are kept,
+    "/news/2015/07/?page=2" becomes "/news/{n}/{n}/?page"
+    """
+    scheme, netloc, path, query, _ = urlparse.urlsplit(url)
+
+    path = re.sub(r"(?i)\b(?=[0-9a-f]*[0-9])(?=[0-9a-f]*[a-f])[0-9a-f]{8,}\b", "{id}", path)
+    path = re.sub(r"\d+", "{n}", path)
+    names = sorted(set(param.split("=", 1)[0] for param in query.split("&") if param))
+
+    if names:
+        path += "?" + "&".join(names)
+
+    return "%s://%s%s" % (scheme, netloc, path)
+
+
+class LinkParser(object):
+    """
+    Incremental link extractor, page text is fed in chunks
+    """
+    MAX_TAIL = 8 * 1024  # longer unfinished links are dropped
+
+    def __init__(self, pattern):
+        """
+        Constructor
+        """
+        self._pattern = re.compile(pattern)
+        self._tail = u""
+        self.links = []
+
+    def feed(self, text):
+        """
+        Parse text chunk, a link at the end of the chunk is parsed with the next one
+        """
+        data = self._tail + text
+
+        # "href='" may be cut at the end
+        keep = max(0, len(data) - 6)
+
+        for item in self._pattern.finditer(data):
+            if item.end() == len(data):
+                keep = item.start()
+                break
+
+            self.links.append(item.group(1))
+            keep = max(keep, item.end())
+
+        self._tail = data[keep:]
+
+        if len(self._tail) > self.MAX_TAIL:
+            self._tail = u""
+
+    def close(self):
+        """
+        Parse the rest of the text
+        """
+        self.links.extend(item.group(1) for item in self._pattern.finditer(self._tail))
+        self._tail = u""
+
+
+class _Page(object):
+    """
+    Fetched page
+    """
+
+    def __init__(self, url, status, redirected, content_type, content=None, size=0):
+        """
+        Constructor
+        """
+        self.url = url
+        self.status = status
+        self.redirected = redirected
+        self.content_type = content_type
+        self.content = content
+        self.links = []
+        self.size = size
+
+
 class LinkCrawler(object):
     """
     URL-redirects crawler
     """
     A_TAG_PATTERN = """(?i)<a([^>]+)>(.+?)</a>"""
     LINK_PATTERN = """href=[\'"]?([^\'" >]+)"""
+    HEADERS = {"User-agent": "Mozilla/5.0"}
+    WORKERS = 8  # pages fetched concurrently
+    HOST_CONCURRENCY = 4  # pages fetched concurrently from a single host
+    MAX_DEPTH = 25  # links followed from the start page (None - unlimited)
+    MAX_PAGES = 10000  # pages fetched per crawl (None - unlimited)
+    MAX_BYTES = 512 * 1024 * 1024  # bytes downloaded per crawl (None - unlimited)
+    POLL_INTERVAL = 0.5  # how often stop_callback is called while waiting for pages
+    JOIN_TIMEOUT = 5  # wait for the workers to finish their pages when the crawl is stopped
+    TEMPLATE_BUDGET = 100  # pages fetched per path template, see path_template() (None - unlimited)
+    MAX_PAGE_SIZE = 2 * 1024 * 1024  # page is truncated if it's bigger
+    READ_SIZE = 64 * 1024
+    SITEMAPS = False  # seed the frontier with robots.txt paths and sitemap URLs
+    SEED_BATCH = 1000  # seeded links put to the frontier at a time
 
-    def __init__(self, recursive=True):
+    # links to such files are checked with HEAD requests, they are never downloaded
+    HEAD_EXTENSIONS = (
+        ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".odt", ".ods", ".rtf", ".txt",
+        ".zip", ".rar", ".gz", ".tgz", ".bz2", ".7z", ".tar", ".exe", ".msi", ".dmg", ".iso",
+        ".jpg", ".jpeg", ".png", ".gif", ".bmp", ".ico", ".svg", ".mp3", ".wav", ".ogg",
+        ".mp4", ".avi", ".mov", ".wmv", ".mpg", ".mpeg", ".flv", ".swf", ".css", ".js",
+    )
+
+    def __init__(self, recursive=True, workers=None, host_concurrency=None, max_depth=MAX_DEPTH,
+                 max_pages=MAX_PAGES, max_bytes=MAX_BYTES, store=None, ignored_params=IGNORED_PARAMS,
+                 template_budget=TEMPLATE_BUDGET, sitemaps=SITEMAPS):
         """
-        Constructor
+        Constructor, pages are read from and written to the shared crawl store
+        unless store is False
         """
         self._recursive = recursive
+        self._sitemaps = sitemaps
+        self._ignored_params = ignored_params
+        self._template_budget = template_budget
+        self._store = get_crawl_store() if store is None else store
+        self._workers = workers or self.WORKERS
+        self._host_concurrency = host_concurrency or self.HOST_CONCURRENCY
+        self._max_depth = max_depth
+        self._max_pages = max_pages
+        self._max_bytes = max_bytes
 
         nop = lambda: None
         skip = lambda arg: None
@@ -37,55 +208,419 @@ class LinkCrawler(object):
         self.redirect_callback = skip
         self.error_callback = skip
         self.nonhtml_callback = skip
+        self.checkpoint_callback = skip
         self.stop_callback = nop
 
         # external links detection strategy
         self.ext_link_test = have_same_base
 
-    def process(self, url):
+    def _text(self, value):
+        """
+        Header value as unicode
+        """
+        if isinstance(value, str):
+            return value.decode("latin-1")
+
+        return value
+
+    def _record(self, resp):
+        """
+        Page record of the response (see CrawlStore.put)
+        """
+        return {
+            "status": resp.status_code,
+            "reason": self._text(resp.reason or ""),
+            "headers": dict((self._text(name), self._text(value)) for name, value in resp.headers.items()),
+            "history": [[r.status_code, r.url] for r in resp.history],
+            "body": None,
+        }
+
+    def _head(self, url):
+        """
+        Fetch file record without the body, None if HEAD is not supported or the file
+        is an HTML page (e.g. an error or login page), it must be downloaded
+        """
+        resp = http.head(url, headers=self.HEADERS, verify=False, allow_redirects=True)
+
+        if resp.status_code in (405, 501):
+            return None
+
+        if resp.headers.get("content-type", "").startswith("text/html"):
+            return None
+
+        return self._record(resp)
+
+    def _read_page(self, resp, record):
         """
-        Iterate the external links from url
+        Read page body up to MAX_PAGE_SIZE and parse its links while it's being downloaded
         """
-        cache = set()
+        encoding = resp.encoding or "utf-8"
+
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        except LookupError:
+            encoding = "utf-8"
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+        parser = LinkParser(self.LINK_PATTERN)
+        body = []
+        size = 0
+
+        for chunk in resp.iter_content(self.READ_SIZE):
+            chunk = chunk[:self.MAX_PAGE_SIZE - size]
+            body.append(chunk)
+            size += len(chunk)
+
+            parser.feed(decoder.decode(chunk))
+
+            if size >= self.MAX_PAGE_SIZE:
+                break
+
+        parser.feed(decoder.decode("", True))
+        parser.close()
+
+        record["body"] = "".join(body)
+        record["encoding"] = encoding
+        record["links"] = parser.links
+
+    def _conditions(self, stored):
+        """
+        Conditional request headers for the stored page
+        """
+        headers = {}
+
+        if stored and stored["status"] == 200 and stored["body"] is not None:
+            if stored["etag"]:
+                headers["If-None-Match"] = stored["etag"]
+
+            if stored["last_modified"]:
+                headers["If-Modified-Since"] = stored["last_modified"]
+
+        return headers
+
+    def _download(self, url, stored=None):
+        """
+        Fetch page record, only HTML pages are downloaded. If the stored page
+        is not modified, it is returned instead
+        """
+        try:
+            if urlparse.urlsplit(url)[2].lower().endswith(self.HEAD_EXTENSIONS):
+                record = self._head(url)
+
+                if record:
+                    return record
+
+            conditions = self._conditions(stored)
+            resp = http.stream("GET", url, headers=dict(self.HEADERS, **conditions), verify=False)
 
-        def populate(url):
             try:
-                resp = requests.get(url, headers={"User-agent": "Mozilla/5.0"}, verify=False)
-            except Exception:
-                return
+                if resp.status_code == 304 and conditions:
+                    # no body, the connection is kept alive
+                    resp.content
+                    metrics.get_metrics().incr("crawl_not_modified")
+                    return stored
+
+                record = self._record(resp)
 
-            # handle redirects
-            if any(r.status_code in (301, 302) for r in resp.history):
-                if self.redirect_callback(url):
-                    return
+                # other content is not downloaded
+                if resp.headers.get("content-type", "").startswith("text/html"):
+                    self._read_page(resp, record)
 
-            # handle errors
-            if resp.status_code >= 400:
-                if self.error_callback("%03d: %s" % (resp.status_code, url)):
-                    return
+            finally:
+                resp.close()
 
-            # handle non-html
-            if not resp.headers.get("content-type", "").startswith("text/html"):
-                self.nonhtml_callback(url)
+        except Exception:
+            return {"status": 0, "headers": {}}
+
+        # the page is the same, its stored links are kept
+        if stored and record["status"] == stored["status"] and record["body"] is not None and \
+                stored["hash"] == body_hash(record["body"]):
+            metrics.get_metrics().incr("crawl_unchanged")
+            return stored
+
+        return record
+
+    def _fetch(self, url):
+        """
+        Get page from the store, revalidate or fetch it, and parse its links, called by the worker threads
+        """
+        record = self._store and self._store.get(url)
+
+        if not record:
+            stored = self._store and self._store.get(url, stale=True)
+            record = self._download(url, stored)
+
+            if record is stored:
+                self._store.touch(url)
+            elif self._store:
+                self._store.put(url, record)
+
+        if not record["status"]:
+            return None
+
+        headers = dict((name.lower(), value) for name, value in record["headers"].items())
+        body = record.get("body")
+
+        page = _Page(
+            url,
+            record["status"],
+            any(status in (301, 302) for status, _ in record["history"]),
+            headers.get("content-type", ""),
+            size=len(body or "")
+        )
+
+        if body is not None and page.content_type.startswith("text/html"):
+            try:
+                page.content = unicode(body, record.get("encoding") or "utf-8", errors="replace")
+            except LookupError:
+                page.content = unicode(body, "utf-8", errors="replace")
+
+            links = record.get("links")
+
+            # pages stored without links are parsed again
+            if links is None:
+                parser = LinkParser(self.LINK_PATTERN)
+                parser.feed(page.content)
+                parser.close()
+                links = parser.links
+
+            page.links = [urlparse.urljoin(url, link) for link in links]
+
+        return page
+
+    def _work(self, jobs, results):
+        """
+        Worker thread main function
+        """
+        while True:
+            job = jobs.get()
+
+            if job is None:
                 return
 
-            # parse pages
-            self.link_content_callback(dict(url=url, content=resp.text))
+            url, depth = job
+
+            try:
+                page = self._fetch(url)
+            except Exception:
+                page = None
+
+            results.put((url, depth, page))
+
+    def _handle(self, page):
+        """
+        Pass the fetched page to the callbacks, returns False if its links should not be followed
+        """
+        if not page:
+            return False
+
+        # handle redirects
+        if page.redirected:
+            if self.redirect_callback(page.url):
+                return False
+
+        # handle errors
+        if page.status >= 400:
+            if self.error_callback("%03d: %s" % (page.status, page.url)):
+                return False
+
+        # handle non-html
+        if not page.content_type.startswith("text/html"):
+            self.nonhtml_callback(page.url)
+            return False
+
+        # parse pages (the body of pages from the store may be missing)
+        if page.content is not None:
+            self.link_content_callback(dict(url=page.url, content=page.content))
+
+        return True
+
+    def _in_budget(self, link, templates):
+        """
+        Count the link in its path template budget, returns False if the budget is spent
+        (near-duplicate pages, e.g. sorting variants or an endless calendar)
+        """
+        if self._template_budget is None:
+            return True
+
+        template = path_template(link)
+        count = templates.get(template, 0)
+
+        if count >= self._template_budget:
+            return False
+
+        templates[template] = count + 1
+
+        return True
+
+    def _follow(self, page, depth, cache, frontier, templates):
+        """
+        Pass the page links to the callbacks and put the new internal links to the frontier,
+        links are deduplicated by their canonical form, callbacks get the links as found
+        """
+        for link in page.links:
+            key = canonicalize(link, self._ignored_params)
+
+            # populate all parsed link (if not cached)
+            if key in cache:
+                continue
+
+            if self.ext_link_test(page.url, link):
+                cache.add(key)
+                self.link_callback(link)
+
+                self.stop_callback()  # check for stopping
+
+                if not self._recursive or (self._max_depth is not None and depth >= self._max_depth):
+                    continue
+
+                if self._in_budget(key, templates):
+                    frontier.append((link, depth + 1))
+            else:
+                self.ext_link_callback(link)
+
+    def _seed(self, url, cache, frontier, templates):
+        """
+        Put the links listed in robots.txt and sitemaps to the frontier as if they were
+        found on the start page (the same canonicalization, dedupe and budgets apply)
+        """
+        page = _Page(url, 200, False, "text/html")
+        count = 0
+
+        for link in sitemap.seeds(url, self.HEADERS):
+            page.links.append(link)
+            count += 1
+
+            if len(page.links) >= self.SEED_BATCH:
+                self._follow(page, 0, cache, frontier, templates)
+                page.links = []
+
+            # more links would not be fetched anyway
+            if self._max_pages is not None and count >= self._max_pages:
+                break
+
+        self._follow(page, 0, cache, frontier, templates)
+
+    def _host(self, url):
+        """
+        Host of the url
+        """
+        return urlparse.urlsplit(url)[1].lower()
+
+    def _dispatch(self, frontier, fetching, hosts, jobs, budget):
+        """
+        Send frontier links to the workers within the concurrency limits and the crawl budget
+        """
+        skipped = []
+
+        # a few links are looked ahead if their host is busy
+        for _ in xrange(min(len(frontier), self._workers * 4)):
+            if len(fetching) >= self._workers or not budget():
+                break
+
+            url, depth = frontier.popleft()
+            host = self._host(url)
+
+            # the same page is already being fetched (e.g. a resumed crawl)
+            if url in fetching:
+                continue
 
-            for item in re.finditer(self.LINK_PATTERN, resp.text):
-                link = urlparse.urljoin(url, item.group(1))
+            if hosts.get(host, 0) >= self._host_concurrency:
+                skipped.append((url, depth))
+                continue
 
-                # populate all parsed link (if not cached)
-                if link not in cache:
-                    if self.ext_link_test(url, link):
-                        cache.add(link)
-                        self.link_callback(link)
+            hosts[host] = hosts.get(host, 0) + 1
+            fetching[url] = depth
+            jobs.put((url, depth))
+
+        frontier.extendleft(reversed(skipped))
+
+    def process(self, url, state=None):
+        """
+        Iterate the external links from url, crawling can be resumed from the state
+        passed to checkpoint_callback
+        """
+        if state:
+            cache = set(state["cache"])
+            frontier = deque(tuple(item) for item in state["fetching"].items() + state["frontier"])
+            templates = state["templates"]
+        else:
+            # links to the start page are not fetched again
+            cache = set([canonicalize(url, self._ignored_params)])
+            frontier = deque([(url, 0)])
+            templates = {}
+
+            if self._recursive and self._sitemaps:
+                self._seed(url, cache, frontier, templates)
+
+        # pages being fetched, url -> depth
+        fetching = {}
+        hosts = {}
+        stats = {"pages": 0, "bytes": 0}
+
+        def budget():
+            if self._max_pages is not None and stats["pages"] >= self._max_pages:
+                return False
+
+            if self._max_bytes is not None and stats["bytes"] >= self._max_bytes:
+                return False
+
+            return True
+
+        jobs = Queue()
+        results = Queue()
+        workers = []
+
+        for _ in xrange(self._workers):
+            worker = Thread(target=self._work, args=(jobs, results))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        try:
+            # breadth-first, links wait in the frontier until a worker is free
+            while True:
+                self.checkpoint_callback(dict(cache=cache, frontier=frontier, fetching=fetching, templates=templates))
+
+                started = len(fetching)
+                self._dispatch(frontier, fetching, hosts, jobs, budget)
+                stats["pages"] += len(fetching) - started
+
+                if not fetching:
+                    break
+
+                try:
+                    page_url, depth, page = results.get(timeout=self.POLL_INTERVAL)
+                except Empty:
+                    self.stop_callback()
+                    continue
+
+                host = self._host(page_url)
+                hosts[host] -= 1
+
+                if page:
+                    stats["bytes"] += page.size
+
+                if self._handle(page):
+                    self._follow(page, depth, cache, frontier, templates)
+
+                # the page is done when its links are in the frontier
+                del fetching[page_url]
+
+        finally:
+            # queued pages are not fetched anymore, workers get the sentinels right away
+            try:
+                while True:
+                    jobs.get_nowait()
+            except Empty:
+                pass
 
-                        self.stop_callback()  # check for stopping
+            for _ in workers:
+                jobs.put(None)
 
-                        if self._recursive:
-                            populate(link)
-                    else:
-                        self.ext_link_callback(link)
+            # daemon threads should not outlive the interpreter, but a stopped crawl
+            # doesn't wait for slow fetches
+            deadline = time() + self.JOIN_TIMEOUT
 
-        populate(url)
+            for worker in workers:
+                worker.join(max(deadline - time(), 0))
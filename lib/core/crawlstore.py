@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+
+import json
+import sqlite3
+from email.utils import formatdate
+from hashlib import sha1
+from os import environ, getpid, listdir, makedirs, remove
+from os.path import getmtime, isdir, join
+from threading import Lock
+from time import time
+from cache import private_dir
+from metrics import get_metrics
+
+DAY = 60 * 60 * 24
+
+
+def body_hash(body):
+    """
+    Page body validator
+    """
+    return sha1(body).hexdigest()
+
+
+class CrawlStore(object):
+    """
+    Persistent store of crawled pages, shared by all crawler scripts: records are appended
+    to WARC-like files (one per process) and indexed by URL in an SQLite database.
+    Pages fetched within the freshness window are served from the store, older pages
+    are revalidated with their validators (ETag, Last-Modified, body hash)
+    """
+    FRESHNESS = DAY  # stored pages are reused if they are not older
+    MAX_AGE = 7 * DAY  # older pages are removed from the store
+    LOCK_TIMEOUT = 30  # wait for other processes holding the database lock
+    INDEX = "index.db"
+    SUFFIX = ".warc"
+
+    def __init__(self, path=None, freshness=None):
+        """
+        Constructor, the store is created in the private directory of the user if path is not set
+        """
+        self.path = path
+        self.freshness = freshness or self.FRESHNESS
+        self._lock = Lock()
+        self._connection = None
+        self._file = None
+        self._file_name = None
+        self._pid = None
+
+    def _connect(self):
+        """
+        Get database connection (connections and record files are not shared with forked processes)
+        """
+        if self._connection and self._pid == getpid():
+            return self._connection
+
+        if not self.path:
+            self.path = private_dir("crawls")
+
+        # page bodies are not readable by other users
+        if not isdir(self.path):
+            makedirs(self.path, 0700)
+
+        connection = sqlite3.connect(join(self.path, self.INDEX), timeout=self.LOCK_TIMEOUT, check_same_thread=False)
+        connection.text_factory = str
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, file TEXT, offset INTEGER, length INTEGER, status INTEGER, "
+            "reason TEXT, headers TEXT, history TEXT, encoding TEXT, fetched REAL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS validators ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, hash TEXT, links TEXT)"
+        )
+        connection.commit()
+
+        self._connection = connection
+        self._file = None
+        self._file_name = "%d-%d%s" % (getpid(), time() * 1000, self.SUFFIX)
+        self._pid = getpid()
+
+        self._evict(connection)
+
+        return connection
+
+    def _evict(self, connection):
+        """
+        Remove old pages and record files which are not referenced anymore
+        """
+        expired = time() - self.MAX_AGE
+
+        connection.execute("DELETE FROM pages WHERE fetched < ?", (expired,))
+        connection.execute("DELETE FROM validators WHERE url NOT IN (SELECT url FROM pages)")
+        connection.commit()
+
+        used = set(row[0] for row in connection.execute("SELECT DISTINCT file FROM pages"))
+
+        for name in listdir(self.path):
+            path = join(self.path, name)
+
+            # files of the running crawls are younger
+            if name.endswith(self.SUFFIX) and name not in used and getmtime(path) < expired:
+                remove(path)
+
+    def _key(self, url):
+        """
+        Stored URL
+        """
+        if isinstance(url, unicode):
+            url = url.encode("utf-8")
+
+        return url
+
+    def _write(self, url, record):
+        """
+        Append WARC response record, returns the offset of the body
+        """
+        if not self._file:
+            self._file = open(join(self.path, self._file_name), "ab")
+
+        self._file.seek(0, 2)
+
+        body = record.get("body") or ""
+        http_head = "HTTP/1.1 %d %s\r\n" % (record["status"], record.get("reason") or "")
+
+        for name, value in record["headers"].items():
+            http_head += "%s: %s\r\n" % (name, value)
+
+        http_head += "\r\n"
+        http_head = http_head.encode("utf-8")
+
+        warc_head = (
+            "WARC/1.0\r\n"
+            "WARC-Type: response\r\n"
+            "WARC-Target-URI: %s\r\n"
+            "WARC-Date: %s\r\n"
+            "Content-Type: application/http; msgtype=response\r\n"
+            "Content-Length: %d\r\n"
+            "\r\n"
+        ) % (self._key(url), formatdate(usegmt=True), len(http_head) + len(body))
+
+        self._file.write(warc_head + http_head)
+        offset = self._file.tell()
+        self._file.write(body + "\r\n\r\n")
+        self._file.flush()
+
+        return offset
+
+    def put(self, url, record):
+        """
+        Store page record: status, reason, headers, history (redirect chain, list of [status, url]),
+        encoding, body (None if not stored) and links parsed from the body. Failed fetches
+        (status 0) are not stored, the next crawl tries again
+        """
+        if not record["status"]:
+            return
+
+        headers = dict((name.lower(), value) for name, value in record["headers"].items())
+        body = record.get("body")
+        links = record.get("links")
+
+        try:
+            with self._lock:
+                connection = self._connect()
+                offset, length = self._write(url, record), None
+
+                if body is not None:
+                    length = len(body)
+
+                connection.execute(
+                    "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        self._key(url),
+                        self._file_name,
+                        offset,
+                        length,
+                        record["status"],
+                        record.get("reason"),
+                        json.dumps(record["headers"]),
+                        json.dumps(record.get("history") or []),
+                        record.get("encoding"),
+                        time()
+                    )
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO validators VALUES (?, ?, ?, ?, ?)",
+                    (
+                        self._key(url),
+                        headers.get("etag"),
+                        headers.get("last-modified"),
+                        body_hash(body) if body is not None else None,
+                        json.dumps(links) if links is not None else None
+                    )
+                )
+                connection.commit()
+
+        except (sqlite3.Error, IOError, OSError, UnicodeError):
+            pass
+
+    def touch(self, url):
+        """
+        Stored page is still valid, it's fresh again
+        """
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute("UPDATE pages SET fetched = ? WHERE url = ?", (time(), self._key(url)))
+                connection.commit()
+
+        except (sqlite3.Error, OSError):
+            pass
+
+    def get(self, url, stale=False):
+        """
+        Get page record with its validators (etag, last_modified, hash) and links
+        if it's fresh (or any stored record if stale is set), None otherwise
+        """
+        fetched = 0 if stale else time() - self.freshness
+
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT file, offset, length, status, reason, headers, history, encoding, "
+                    "etag, last_modified, hash, links FROM pages LEFT JOIN validators USING (url) "
+                    "WHERE url = ? AND fetched >= ? AND status != 0",
+                    (self._key(url), fetched)
+                ).fetchone()
+
+            if not row:
+                if not stale:
+                    get_metrics().incr("crawl_store_misses")
+
+                return None
+
+            name, offset, length, status, reason, headers, history, encoding, etag, last_modified, digest, links = row
+            body = None
+
+            if length is not None:
+                with open(join(self.path, name), "rb") as f:
+                    f.seek(offset)
+                    body = f.read(length)
+
+                if len(body) != length:
+                    return None
+
+        except (sqlite3.Error, IOError, OSError):
+            return None
+
+        if not stale:
+            get_metrics().incr("crawl_store_hits")
+
+        return {
+            "status": status,
+            "reason": reason,
+            "headers": json.loads(headers),
+            "history": json.loads(history),
+            "encoding": encoding,
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified,
+            "hash": digest,
+            "links": json.loads(links) if links else None,
+        }
+
+
+_store = None
+_store_lock = Lock()
+
+
+def get_crawl_store():
+    """
+    Get crawl store shared by all tasks of the process, GTTA_CRAWL_STORE_PATH sets the store
+    directory (the private directory of the user by default), GTTA_CRAWL_FRESHNESS - freshness window in seconds, GTTA_NO_CRAWL_STORE=1 disables
+    the store (None is returned)
+    """
+    global _store
+
+    if environ.get("GTTA_NO_CRAWL_STORE") == "1":
+        return None
+
+    with _store_lock:
+        if not _store:
+            freshness = environ.get("GTTA_CRAWL_FRESHNESS")
+
+            _store = CrawlStore(
+                environ.get("GTTA_CRAWL_STORE_PATH"),
+                float(freshness) if freshness else None
+            )
+
+    return _store
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+from array import array
+from hashlib import md5
+from math import ceil, log
+from struct import unpack
+from tempfile import mkstemp
+from threading import Lock
+
+OVERFLOW_DISK = "disk"
+OVERFLOW_BLOOM = "bloom"
+
+
+class _MemoryStore(object):
+    """
+    Exact in-memory set
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._items = set()
+
+    def add(self, item):
+        """
+        Add item, returns False if it was already there
+        """
+        if item in self._items:
+            return False
+
+        self._items.add(item)
+
+        return True
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def close(self):
+        """
+        Release the storage
+        """
+        self._items = set()
+
+
+class _DiskStore(object):
+    """
+    Exact set in a temporary SQLite database
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        fd, self._path = mkstemp(prefix="gtta-dedupe-", suffix=".db")
+        os.close(fd)
+
+        self._db = sqlite3.connect(self._path, isolation_level=None, check_same_thread=False)
+        self._db.text_factory = str
+        self._db.execute("PRAGMA journal_mode = OFF")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.execute("CREATE TABLE items (item BLOB PRIMARY KEY)")
+        self._size = 0
+
+        # the open database stays usable and nothing is left behind if the process is killed
+        os.remove(self._path)
+
+    def _key(self, item):
+        """
+        Stored item
+        """
+        if isinstance(item, unicode):
+            item = item.encode("utf-8")
+
+        return item
+
+    def add(self, item):
+        """
+        Add item, returns False if it was already there
+        """
+        cursor = self._db.execute("INSERT OR IGNORE INTO items VALUES (?)", (self._key(item),))
+
+        if cursor.rowcount != 1:
+            return False
+
+        self._size += 1
+
+        return True
+
+    def __contains__(self, item):
+        return self._db.execute("SELECT 1 FROM items WHERE item = ?", (self._key(item),)).fetchone() is not None
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for row in self._db.execute("SELECT item FROM items"):
+            yield row[0].decode("utf-8")
+
+    def close(self):
+        """
+        Close the database
+        """
+        self._db.close()
+
+
+class _BloomStore(object):
+    """
+    Bloom filter, uses a fixed amount of memory but may take a new item for a
+    duplicate with the given probability (such items are dropped)
+    """
+
+    def __init__(self, capacity, error_rate):
+        """
+        Constructor
+        """
+        self._bits = int(ceil(-capacity * log(error_rate) / (log(2) ** 2)))
+        self._hashes = max(1, int(round(self._bits / float(capacity) * log(2))))
+        self._array = array("B", [0]) * ((self._bits + 7) / 8)
+        self._size = 0
+
+    def _positions(self, item):
+        """
+        Bit positions of the item (double hashing)
+        """
+        if isinstance(item, unicode):
+            item = item.encode("utf-8")
+
+        first, second = unpack("<QQ", md5(item).digest())
+
+        for i in xrange(self._hashes):
+            yield (first + i * second) % self._bits
+
+    def add(self, item):
+        """
+        Add item, returns False if it was (probably) already there
+        """
+        new = False
+
+        for position in self._positions(item):
+            byte, bit = position >> 3, 1 << (position & 7)
+
+            if not self._array[byte] & bit:
+                self._array[byte] |= bit
+                new = True
+
+        if new:
+            self._size += 1
+
+        return new
+
+    def __contains__(self, item):
+        for position in self._positions(item):
+            if not self._array[position >> 3] & (1 << (position & 7)):
+                return False
+
+        return True
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        raise TypeError("Bloom filter items can't be listed.")
+
+    def close(self):
+        """
+        Release the storage
+        """
+        self._array = array("B")
+
+
+class Deduplicator(object):
+    """
+    Thread-safe set of seen items, kept in memory until it grows over MAX_MEMORY_ITEMS,
+    then moved to a temporary database (exact) or a Bloom filter (approximate)
+    """
+    MAX_MEMORY_ITEMS = 1000000
+    BLOOM_CAPACITY = 10000000  # expected number of items in the Bloom filter
+    BLOOM_ERROR_RATE = 0.001  # probability to drop a new item
+
+    def __init__(self, overflow=OVERFLOW_DISK, max_memory_items=None):
+        """
+        Constructor, overflow is "disk", "bloom" or None (always keep in memory)
+        """
+        if overflow not in (OVERFLOW_DISK, OVERFLOW_BLOOM, None):
+            raise ValueError("Invalid overflow mode: %s" % overflow)
+
+        self._overflow = overflow
+        self._max_memory_items = max_memory_items or self.MAX_MEMORY_ITEMS
+        self._store = _MemoryStore()
+        self._lock = Lock()
+
+    def _spill(self):
+        """
+        Move items from memory to the overflow store, lock must be held
+        """
+        if self._overflow == OVERFLOW_BLOOM:
+            store = _BloomStore(max(self.BLOOM_CAPACITY, 10 * len(self._store)), self.BLOOM_ERROR_RATE)
+        else:
+            store = _DiskStore()
+
+        for item in self._store:
+            store.add(item)
+
+        self._store.close()
+        self._store = store
+
+    def add(self, item):
+        """
+        Add item, returns True if it was not seen before
+        """
+        with self._lock:
+            if not self._store.add(item):
+                return False
+
+            if self._overflow and isinstance(self._store, _MemoryStore) and len(self._store) > self._max_memory_items:
+                self._spill()
+
+        return True
+
+    def update(self, items):
+        """
+        Add items
+        """
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        with self._lock:
+            return item in self._store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __iter__(self):
+        """
+        Iterate a snapshot of the items (not supported by the Bloom filter)
+        """
+        with self._lock:
+            return iter(list(self._store))
+
+    def close(self):
+        """
+        Release the storage
+        """
+        with self._lock:
+            self._store.close()
+            self._store = _MemoryStore()
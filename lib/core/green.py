@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cooperative execution support for tasks with ASYNC = True.
+
+Scripts should import this module before any other module, so that
+blocking socket, DNS and sleep calls imported by name become cooperative:
+
+    import core.green
+"""
+
+from gevent import monkey, sleep, spawn
+from gevent.pool import Pool
+import core
+
+
+def patch():
+    """
+    Make blocking standard library calls cooperative (threads are left intact)
+    """
+    if not monkey.is_module_patched("socket"):
+        monkey.patch_all(thread=False)
+
+
+# the resident runner loads scripts without running them, only its job processes are patched
+if not core._task_loader:
+    patch()
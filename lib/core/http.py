@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+import os
+import urlparse
+from threading import Lock
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+
+TIMEOUT = 30  # default timeout, same as Task.HTTP_TIMEOUT
+POOL_SIZE = 10  # connections kept alive per host
+MAX_RESPONSE_SIZE = 10 * 1024 * 1024  # response body is truncated if it's bigger
+READ_SIZE = 64 * 1024
+
+RequestException = requests.RequestException
+
+
+class _Pool(object):
+    """
+    Keep-alive sessions shared by all threads, one per host
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._lock = Lock()
+        self._sessions = {}
+        self._connections = {}
+        self._pid = os.getpid()
+
+    def _create_session(self):
+        """
+        Create session
+        """
+        session = requests.Session()
+        session.headers["Accept-Encoding"] = "gzip, deflate"
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        return session
+
+    def get(self, url):
+        """
+        Get session of the url host
+        """
+        scheme, netloc = urlparse.urlsplit(url)[:2]
+        key = "%s://%s" % (scheme.lower(), netloc.lower())
+
+        with self._lock:
+            # connections of the parent process can't be used by forked pool workers
+            if self._pid != os.getpid():
+                self._sessions = {}
+                self._connections = {}
+                self._pid = os.getpid()
+
+            session = self._sessions.get(key)
+
+            if not session:
+                session = self._create_session()
+                self._sessions[key] = session
+
+        return session
+
+    def new_connections(self, session):
+        """
+        Number of connections opened by the session since the last call
+        """
+        count = 0
+
+        # the same adapter is mounted for http and https
+        for adapter in set(session.adapters.values()):
+            for key in adapter.poolmanager.pools.keys():
+                pool = adapter.poolmanager.pools.get(key)
+
+                if pool:
+                    count += pool.num_connections
+
+        with self._lock:
+            new = count - self._connections.get(session, 0)
+            self._connections[session] = max(count, self._connections.get(session, 0))
+
+        return max(new, 0)
+
+    def close(self):
+        """
+        Close all sessions
+        """
+        with self._lock:
+            sessions = self._sessions.values()
+            self._sessions = {}
+            self._connections = {}
+
+        for session in sessions:
+            session.close()
+
+
+_pool = _Pool()
+
+
+def get_session(url):
+    """
+    Get keep-alive session of the url host, shared by all threads
+    """
+    return _pool.get(url)
+
+
+def _read(response, max_bytes):
+    """
+    Read response body up to max_bytes, response.truncated is set if it's bigger
+    """
+    content = []
+    size = 0
+    response.truncated = False
+
+    for chunk in response.iter_content(READ_SIZE):
+        content.append(chunk)
+        size += len(chunk)
+
+        if max_bytes and size > max_bytes:
+            response.truncated = True
+            break
+
+    content = "".join(content)
+
+    if response.truncated:
+        content = content[:max_bytes]
+
+        # the rest of the body is not read, the connection can't be reused
+        response.raw.close()
+
+    response._content = content
+    response._content_consumed = True
+
+
+def stream(method, url, timeout=None, **kwargs):
+    """
+    Send request through the host session, keyword arguments are passed to requests.
+    Response body is not read: use response.iter_content() and close the response
+    (the connection is dropped if the body is not read till the end)
+    """
+    session = get_session(url)
+    response = session.request(method, url, timeout=timeout or TIMEOUT, stream=True, **kwargs)
+
+    # requests minus connections is the number of reused connections
+    task_metrics = metrics.get_metrics()
+    task_metrics.incr("http_pool_requests")
+    task_metrics.incr("http_pool_connections", _pool.new_connections(session))
+
+    return response
+
+
+def request(method, url, timeout=None, max_bytes=MAX_RESPONSE_SIZE, **kwargs):
+    """
+    Send request through the host session, keyword arguments are passed to requests.
+    Response body is read up to max_bytes (None - unlimited)
+    """
+    response = stream(method, url, timeout, **kwargs)
+
+    try:
+        _read(response, max_bytes)
+    finally:
+        response.close()
+
+    return response
+
+
+def get(url, **kwargs):
+    """
+    Send GET request
+    """
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    """
+    Send POST request
+    """
+    return request("POST", url, **kwargs)
+
+
+def head(url, **kwargs):
+    """
+    Send HEAD request, redirects are not followed by default
+    """
+    kwargs.setdefault("allow_redirects", False)
+    return request("HEAD", url, **kwargs)
+
+
+def options(url, **kwargs):
+    """
+    Send OPTIONS request
+    """
+    return request("OPTIONS", url, **kwargs)
+
+
+def close():
+    """
+    Close all sessions
+    """
+    _pool.close()
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+
+import socket as _socket_module
+from _socket import socket as _native_socket
+from contextlib import contextmanager
+from heapq import heappush, heappushpop
+from os import environ
+import sys
+from sys import modules
+from threading import Lock
+from time import time
+
+# upper bounds of target latency histogram buckets, seconds
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+
+class Metrics(object):
+    """
+    Thread-safe task metrics: counters, phase timers and per-target latency
+    """
+    SLOWEST_TARGETS = 20  # slowest targets kept in the report
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all metrics
+        """
+        with self._lock:
+            self._counters = {}
+            self._phases = {}
+            self._latency = {
+                "count": 0,
+                "total": 0.0,
+                "min": None,
+                "max": None,
+                "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+            }
+            self._slowest = []
+
+    def incr(self, name, value=1):
+        """
+        Increment counter
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def add_phase(self, name, elapsed):
+        """
+        Add time spent in the phase
+        """
+        with self._lock:
+            self._phases[name] = self._phases.get(name, 0.0) + elapsed
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measure time of the enclosed block as the phase
+        """
+        started = time()
+
+        try:
+            yield
+        finally:
+            self.add_phase(name, time() - started)
+
+    def add_target(self, target, elapsed):
+        """
+        Record target processing time
+        """
+        with self._lock:
+            self._add_latency(elapsed, 1, elapsed, elapsed, None)
+            self._add_slowest(elapsed, target)
+
+    def _add_latency(self, total, count, low, high, buckets):
+        """
+        Merge latency statistics, lock must be held
+        """
+        latency = self._latency
+        latency["count"] += count
+        latency["total"] += total
+
+        if latency["min"] is None or low < latency["min"]:
+            latency["min"] = low
+
+        if latency["max"] is None or high > latency["max"]:
+            latency["max"] = high
+
+        if buckets is None:
+            bucket = len(LATENCY_BUCKETS)
+
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if total <= bound:
+                    bucket = i
+                    break
+
+            latency["buckets"][bucket] += 1
+
+        else:
+            for i, count in enumerate(buckets):
+                latency["buckets"][i] += count
+
+    def _add_slowest(self, elapsed, target):
+        """
+        Keep the slowest targets, lock must be held
+        """
+        if len(self._slowest) < self.SLOWEST_TARGETS:
+            heappush(self._slowest, (elapsed, target))
+        else:
+            heappushpop(self._slowest, (elapsed, target))
+
+    def snapshot(self):
+        """
+        Get metrics as a JSON-serializable dict
+        """
+        with self._lock:
+            latency = dict(self._latency)
+            latency["buckets"] = list(latency["buckets"])
+            latency["mean"] = latency["total"] / latency["count"] if latency["count"] else None
+            latency["bucket_bounds"] = list(LATENCY_BUCKETS) + [None]
+
+            return {
+                "counters": dict(self._counters),
+                "phases": dict(self._phases),
+                "targets": latency,
+                "slowest_targets": [
+                    {"target": target, "time": elapsed} for elapsed, target in sorted(self._slowest, reverse=True)
+                ],
+            }
+
+    def merge(self, snapshot):
+        """
+        Add metrics collected elsewhere (e.g. in a pool process)
+        """
+        with self._lock:
+            for name, value in snapshot["counters"].iteritems():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+            for name, value in snapshot["phases"].iteritems():
+                self._phases[name] = self._phases.get(name, 0.0) + value
+
+            latency = snapshot["targets"]
+
+            if latency["count"]:
+                self._add_latency(latency["total"], latency["count"], latency["min"], latency["max"], latency["buckets"])
+
+            for item in snapshot["slowest_targets"]:
+                self._add_slowest(item["time"], item["target"])
+
+    def write(self, path):
+        """
+        Write metrics to the JSON file
+        """
+        import json
+
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+class _MeteredSocket(_native_socket):
+    """
+    Native socket which counts connections and traffic
+    """
+    __slots__ = ("_connecting",)
+
+    def __init__(self, *args, **kwargs):
+        """
+        Constructor
+        """
+        super(_MeteredSocket, self).__init__(*args, **kwargs)
+        self._connecting = False
+        _metrics.incr("sockets_opened")
+
+    def _count_connection(self):
+        """
+        Count the connection once, gevent sockets call connect_ex until they are connected
+        """
+        if not self._connecting:
+            self._connecting = True
+            _metrics.incr("connections")
+
+    def connect(self, *args):
+        self._count_connection()
+        return super(_MeteredSocket, self).connect(*args)
+
+    def connect_ex(self, *args):
+        self._count_connection()
+        return super(_MeteredSocket, self).connect_ex(*args)
+
+    def send(self, data, *args):
+        sent = super(_MeteredSocket, self).send(data, *args)
+        _metrics.incr("bytes_sent", sent)
+        return sent
+
+    def sendall(self, data, *args):
+        result = super(_MeteredSocket, self).sendall(data, *args)
+        _metrics.incr("bytes_sent", len(data))
+        return result
+
+    def sendto(self, data, *args):
+        sent = super(_MeteredSocket, self).sendto(data, *args)
+        _metrics.incr("bytes_sent", sent)
+        return sent
+
+    def recv(self, *args):
+        data = super(_MeteredSocket, self).recv(*args)
+        _metrics.incr("bytes_received", len(data))
+        return data
+
+    def recv_into(self, *args):
+        received = super(_MeteredSocket, self).recv_into(*args)
+        _metrics.incr("bytes_received", received)
+        return received
+
+    def recvfrom(self, *args):
+        data, address = super(_MeteredSocket, self).recvfrom(*args)
+        _metrics.incr("bytes_received", len(data))
+        return data, address
+
+    def recvfrom_into(self, *args):
+        received, address = super(_MeteredSocket, self).recvfrom_into(*args)
+        _metrics.incr("bytes_received", received)
+        return received, address
+
+
+def _wrap_ssl(ssl_socket):
+    """
+    Count TLS traffic, it doesn't go through the socket methods
+    """
+    read, write = ssl_socket.read, ssl_socket.write
+
+    def metered_read(self, *args):
+        data = read(self, *args)
+        _metrics.incr("bytes_received", data if isinstance(data, (int, long)) else len(data))
+        return data
+
+    def metered_write(self, data):
+        sent = write(self, data)
+        _metrics.incr("bytes_sent", sent)
+        return sent
+
+    ssl_socket.read = metered_read
+    ssl_socket.write = metered_write
+
+
+def _wrap_http(connection):
+    """
+    Count HTTP requests
+    """
+    putrequest = connection.putrequest
+
+    def metered_putrequest(self, *args, **kwargs):
+        _metrics.incr("http_requests")
+        return putrequest(self, *args, **kwargs)
+
+    connection.putrequest = metered_putrequest
+
+
+class _ImportHook(object):
+    """
+    Instruments modules when they are imported, so metrics don't slow down
+    the startup of scripts which never use them
+    """
+
+    def __init__(self, wrappers):
+        """
+        Constructor
+        """
+        self._wrappers = wrappers
+        self._loading = set()
+
+    def find_module(self, name, path=None):
+        """
+        Take over the import of the instrumented modules
+        """
+        if name in self._wrappers and name not in self._loading:
+            return self
+
+        return None
+
+    def load_module(self, name):
+        """
+        Import module in the usual way and instrument it
+        """
+        if name in modules:
+            return modules[name]
+
+        self._loading.add(name)
+
+        try:
+            module = __import__(name)
+        finally:
+            self._loading.discard(name)
+
+        self._wrappers[name](module)
+
+        return module
+
+
+_metrics = Metrics()
+_instrumented = False
+_instrument_lock = Lock()
+
+# instrumented modules and functions which instrument them
+_WRAPPERS = {
+    "ssl": lambda module: _wrap_ssl(module.SSLSocket),
+    "httplib": lambda module: _wrap_http(module.HTTPConnection),
+}
+
+
+def get_metrics():
+    """
+    Get metrics shared by all tasks of the process
+    """
+    return _metrics
+
+
+def enabled():
+    """
+    Check if metrics are collected, GTTA_NO_METRICS=1 disables them
+    """
+    return environ.get("GTTA_NO_METRICS") != "1"
+
+
+def instrument():
+    """
+    Count sockets, traffic and HTTP requests of the standard library (and gevent) sockets
+    """
+    global _instrumented
+
+    with _instrument_lock:
+        if _instrumented:
+            return
+
+        _instrumented = True
+
+    _socket_module._realsocket = _MeteredSocket
+
+    # gevent keeps its own reference to the native socket type
+    if "gevent._socket2" in modules:
+        modules["gevent._socket2"]._realsocket = _MeteredSocket
+
+    pending = {}
+
+    for name, wrapper in _WRAPPERS.iteritems():
+        if name in modules:
+            wrapper(modules[name])
+        else:
+            pending[name] = wrapper
+
+    if pending:
+        sys.meta_path.insert(0, _ImportHook(pending))
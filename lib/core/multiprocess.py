@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from multiprocessing import Pool, TimeoutError
+from cStringIO import StringIO
+from error import TaskTimeout
+from metrics import get_metrics
+
+# task class and settings of the current pool process
+_task_class = None
+_task_settings = None
+
+
+def _init_process(task_class, settings):
+    """
+    Pool process initializer
+    """
+    global _task_class, _task_settings
+
+    _task_class = task_class
+    _task_settings = settings
+
+
+def create_pool(task):
+    """
+    Create process pool for the task
+    """
+    return Pool(task.PROCESSES, _init_process, (type(task), task._worker_settings()))
+
+
+def run_target(target):
+    """
+    Run a single target in the pool process, returns (output, produced_output, error, metrics)
+    """
+    # the parent collects metrics of every target, so only this target is reported
+    get_metrics().reset()
+
+    worker = _task_class(worker=True)
+
+    for name, value in _task_settings.iteritems():
+        setattr(worker, name, value)
+
+    worker._result = StringIO()
+
+    try:
+        worker._run_target(target)
+
+    except TaskTimeout:
+        pass
+
+    except Exception, e:
+        worker._write_error(e)
+
+    return worker._result.getvalue(), worker.produced_output, worker.error, get_metrics().snapshot()
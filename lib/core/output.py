@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+from threading import Lock, Thread, Event
+from time import time
+
+
+class ResultWriter(object):
+    """
+    Buffered result file writer, flushes when the buffer is full or on timer
+    """
+    BUFFER_SIZE = 64 * 1024
+    FLUSH_INTERVAL = 1  # seconds
+
+    def __init__(self, stream, buffer_size=BUFFER_SIZE, flush_interval=FLUSH_INTERVAL):
+        """
+        Constructor
+        """
+        self._stream = stream
+        self._buffer = []
+        self._size = 0
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._last_flush = time()
+        self._lock = Lock()
+        self._closed = Event()
+
+        self._flusher = Thread(target=self._flush_periodically)
+        self._flusher.daemon = True
+        self._flusher.start()
+
+    def _flush_periodically(self):
+        """
+        Flush data which waits in the buffer for too long
+        """
+        while not self._closed.wait(self._flush_interval):
+            if time() - self._last_flush >= self._flush_interval:
+                self.flush()
+
+    def _flush_buffer(self):
+        """
+        Write buffer to the stream, should be called with the lock held
+        """
+        if self._buffer:
+            self._stream.write("".join(self._buffer))
+            self._buffer = []
+            self._size = 0
+
+        self._stream.flush()
+        self._last_flush = time()
+
+    def write(self, data):
+        """
+        Write data
+        """
+        with self._lock:
+            self._buffer.append(data)
+            self._size += len(data)
+
+            if self._size >= self._buffer_size:
+                self._flush_buffer()
+
+    def flush(self):
+        """
+        Write all buffered data to the stream
+        """
+        with self._lock:
+            self._flush_buffer()
+
+    def tell(self):
+        """
+        Flush and get the stream position
+        """
+        with self._lock:
+            self._flush_buffer()
+            return self._stream.tell()
+
+    def close(self):
+        """
+        Flush and stop the timer, the stream is left open
+        """
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+
+
+class ResultSink(object):
+    """
+    Thread-safe result stream shared by all worker threads
+    """
+
+    def __init__(self, stream):
+        """
+        Constructor
+        """
+        self._stream = stream
+        self._lock = Lock()
+        self.produced_output = False
+
+    def write(self, data):
+        """
+        Write a block of data
+        """
+        if not data:
+            return
+
+        with self._lock:
+            self._stream.write(data)
+            self.produced_output = True
+
+    def flush(self):
+        """
+        Flush the underlying stream
+        """
+        with self._lock:
+            self._stream.flush()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+import sys
+from collections import defaultdict
+from os import environ
+from threading import Lock, Thread, Event, current_thread
+from time import sleep
+
+MODE_CPROFILE = "cprofile"
+MODE_SAMPLE = "sample"
+MODES = (MODE_CPROFILE, MODE_SAMPLE)
+
+
+class _Snapshot(object):
+    """
+    Stats of a profile taken without disabling it, so threads which are still
+    running (timed out tasks) don't lose their profile
+    """
+
+    def __init__(self, profile):
+        """
+        Constructor
+        """
+        profile.snapshot_stats()
+        self.stats = profile.stats
+
+    def create_stats(self):
+        """
+        Called by pstats, the stats are already collected
+        """
+        pass
+
+
+class CProfiler(object):
+    """
+    Deterministic profiler, every task thread has its own cProfile profile
+    which are merged into a single pstats file (including the threads which
+    are still running)
+    """
+    SUFFIX = ".prof"
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._lock = Lock()
+        self._profiles = []
+
+    def start(self):
+        """
+        Start profiling
+        """
+        pass
+
+    def run(self, func):
+        """
+        Run function with the profiler enabled in the current thread
+        """
+        import cProfile
+
+        profile = cProfile.Profile()
+
+        with self._lock:
+            self._profiles.append(profile)
+
+        profile.enable()
+
+        try:
+            func()
+        finally:
+            profile.disable()
+
+    def stop(self):
+        """
+        Stop profiling
+        """
+        pass
+
+    def write(self, path):
+        """
+        Write merged profile of all threads
+        """
+        import pstats
+
+        with self._lock:
+            profiles = list(self._profiles)
+
+        if not profiles:
+            return
+
+        stats = pstats.Stats(_Snapshot(profiles[0]))
+
+        for profile in profiles[1:]:
+            stats.add(_Snapshot(profile))
+
+        stats.dump_stats(path)
+
+
+class SamplingProfiler(object):
+    """
+    Low-overhead statistical profiler: stacks of the task threads are sampled
+    periodically and written in the collapsed format (one "frame;frame;... count"
+    line per stack) used by flame graph tools
+    """
+    SUFFIX = ".collapsed"
+    INTERVAL = 0.01  # seconds between samples
+
+    def __init__(self, interval=None):
+        """
+        Constructor
+        """
+        self._interval = interval or self.INTERVAL
+        self._lock = Lock()
+        self._threads = set()
+        self._stacks = defaultdict(int)
+        self._stop = Event()
+        self._sampler = None
+
+    def start(self):
+        """
+        Start the sampler thread
+        """
+        self._sampler = Thread(target=self._sample)
+        self._sampler.daemon = True
+        self._sampler.start()
+
+    def run(self, func):
+        """
+        Run function with the current thread being sampled
+        """
+        ident = current_thread().ident
+
+        with self._lock:
+            self._threads.add(ident)
+
+        try:
+            func()
+        finally:
+            with self._lock:
+                self._threads.discard(ident)
+
+    def _frame_name(self, frame):
+        """
+        Get frame name
+        """
+        code = frame.f_code
+        return "%s (%s:%d)" % (code.co_name, code.co_filename, code.co_firstlineno)
+
+    def _sample(self):
+        """
+        Sampler thread main function
+        """
+        while not self._stop.isSet():
+            sleep(self._interval)
+
+            with self._lock:
+                threads = set(self._threads)
+
+            for ident, frame in sys._current_frames().items():
+                if ident not in threads:
+                    continue
+
+                stack = []
+
+                while frame:
+                    stack.append(self._frame_name(frame))
+                    frame = frame.f_back
+
+                stack.reverse()
+
+                with self._lock:
+                    self._stacks[";".join(stack)] += 1
+
+    def stop(self):
+        """
+        Stop the sampler thread
+        """
+        self._stop.set()
+
+        if self._sampler:
+            self._sampler.join()
+
+    def write(self, path):
+        """
+        Write collapsed stacks
+        """
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+
+        if not stacks:
+            return
+
+        with open(path, "w") as f:
+            for stack, count in stacks:
+                f.write("%s %d\n" % (stack, count))
+
+
+def get_mode(args):
+    """
+    Get profiler mode from the --profile[=mode] argument (removed from args)
+    or GTTA_PROFILE environment variable, None if profiling is disabled
+    """
+    mode = environ.get("GTTA_PROFILE") or None
+
+    for arg in list(args):
+        if arg == "--profile":
+            mode = MODE_CPROFILE
+            args.remove(arg)
+
+        elif arg.startswith("--profile="):
+            mode = arg.split("=", 1)[1]
+            args.remove(arg)
+
+    if mode and mode not in MODES:
+        raise ValueError("Invalid profiler mode: %s" % mode)
+
+    return mode
+
+
+def create_profiler(mode):
+    """
+    Create profiler, GTTA_PROFILE_INTERVAL sets the sampling interval
+    """
+    if mode == MODE_SAMPLE:
+        interval = environ.get("GTTA_PROFILE_INTERVAL")
+        return SamplingProfiler(float(interval) if interval else None)
+
+    return CProfiler()
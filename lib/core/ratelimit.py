@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+from contextlib import contextmanager
+from threading import Lock
+from time import time, sleep
+
+
+class TokenBucket(object):
+    """
+    Token bucket with a concurrency limit for a single destination
+    """
+
+    def __init__(self, rate=None, burst=1, concurrency=None):
+        """
+        Constructor, rate is requests per second (None - unlimited)
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.concurrency = concurrency
+        self.active = 0
+        self._tokens = float(self.burst)
+        self._updated = time()
+
+    def _refill(self, now):
+        """
+        Add tokens for the elapsed time
+        """
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+
+        self._updated = now
+
+    def take(self):
+        """
+        Take a token and a connection slot, returns seconds to wait if not available
+        """
+        now = time()
+        self._refill(now)
+
+        if self.concurrency and self.active >= self.concurrency:
+            # a slot is released by another request, there's no way to know when
+            return RateLimiter.POLL_INTERVAL
+
+        if self.rate and self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+
+        if self.rate:
+            self._tokens -= 1
+
+        self.active += 1
+
+        return 0
+
+
+class RateLimiter(object):
+    """
+    Per-destination rate and concurrency limiter shared by all threads (and greenlets)
+    """
+    POLL_INTERVAL = 0.05  # wait step if the concurrency limit is reached
+    MAX_WAIT = 0.5  # max wait step, so stopped tasks are noticed in time
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._lock = Lock()
+        self._buckets = {}
+
+    def configure(self, destination, rate=None, burst=1, concurrency=None):
+        """
+        Set destination limits, destination is "host:port" or service name
+        """
+        with self._lock:
+            self._buckets[destination] = TokenBucket(rate, burst, concurrency)
+
+    def _get_bucket(self, destination, rate, burst, concurrency):
+        """
+        Get destination bucket, created with the given limits if the destination is not configured
+        """
+        bucket = self._buckets.get(destination)
+
+        if not bucket:
+            bucket = TokenBucket(rate, burst, concurrency)
+            self._buckets[destination] = bucket
+
+        return bucket
+
+    def acquire(self, destination, rate=None, burst=1, concurrency=None, check=None):
+        """
+        Wait until a request to the destination is allowed,
+        check is called while waiting (e.g. Task._check_stop)
+        """
+        while True:
+            with self._lock:
+                wait = self._get_bucket(destination, rate, burst, concurrency).take()
+
+            if not wait:
+                return
+
+            if check:
+                check()
+
+            sleep(min(wait, self.MAX_WAIT))
+
+    def release(self, destination):
+        """
+        Request to the destination is finished
+        """
+        with self._lock:
+            bucket = self._buckets.get(destination)
+
+            if bucket and bucket.active > 0:
+                bucket.active -= 1
+
+    def wait(self, destination, rate=None, burst=1, check=None):
+        """
+        Wait for the destination rate limit, for requests which don't need a connection slot
+        """
+        self.acquire(destination, rate, burst, None, check)
+        self.release(destination)
+
+    @contextmanager
+    def limit(self, destination, rate=None, burst=1, concurrency=None, check=None):
+        """
+        Run the enclosed request within the destination limits
+        """
+        self.acquire(destination, rate, burst, concurrency, check)
+
+        try:
+            yield
+        finally:
+            self.release(destination)
+
+
+_limiter = RateLimiter()
+
+
+def get_limiter():
+    """
+    Get rate limiter shared by all tasks of the process
+    """
+    return _limiter
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+from threading import Lock
+from time import time
+from collections import OrderedDict
+from dns.resolver import Resolver, NXDOMAIN, NoAnswer, NoNameservers
+from dns.exception import Timeout
+from dns.rdatatype import SOA
+from metrics import get_metrics
+
+
+class CachingResolver(object):
+    """
+    Thread-safe DNS resolver with positive and negative answer cache
+    """
+    DEFAULT_LIFETIME = 10  # DNS request timeout
+    RETRIES = 1  # retries on timeouts and failed name servers
+    NEGATIVE_TTL = 60  # negative answer TTL if the zone doesn't specify it
+    MAX_NEGATIVE_TTL = 60 * 60
+    MAX_ENTRIES = 10000
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._lock = Lock()
+        self._cache = OrderedDict()
+        self._resolvers = {}
+
+    def _get_resolver(self, nameservers):
+        """
+        Get resolver for the given name servers (system name servers by default)
+        """
+        with self._lock:
+            resolver = self._resolvers.get(nameservers)
+
+            if not resolver:
+                resolver = Resolver()
+
+                if nameservers:
+                    resolver.nameservers = list(nameservers)
+
+                self._resolvers[nameservers] = resolver
+
+        return resolver
+
+    def _negative_ttl(self, e):
+        """
+        Get negative answer TTL from the SOA record in the authority section
+        """
+        kwargs = getattr(e, "kwargs", None) or {}
+        responses = (kwargs.get("responses") or {}).values()
+
+        if kwargs.get("response"):
+            responses.append(kwargs["response"])
+
+        for response in responses:
+            for rrset in response.authority:
+                if rrset.rdtype == SOA:
+                    return min(rrset.ttl, rrset[0].minimum, self.MAX_NEGATIVE_TTL)
+
+        return self.NEGATIVE_TTL
+
+    def _get_cached(self, key):
+        """
+        Get cached (expiration, answer, error) entry
+        """
+        with self._lock:
+            entry = self._cache.get(key)
+
+            if not entry:
+                return None
+
+            if entry[0] < time():
+                del self._cache[key]
+                return None
+
+            # move to the end of LRU order
+            del self._cache[key]
+            self._cache[key] = entry
+
+            return entry
+
+    def _set_cached(self, key, expiration, answer, error):
+        """
+        Cache entry
+        """
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache[key] = (expiration, answer, error)
+
+            while len(self._cache) > self.MAX_ENTRIES:
+                self._cache.popitem(last=False)
+
+    def query(self, name, rdtype="A", nameservers=None, lifetime=None):
+        """
+        Query DNS record, answers and NXDOMAIN/NoAnswer errors are cached
+        """
+        if nameservers:
+            nameservers = tuple(sorted(nameservers))
+
+        key = (name.lower().rstrip("."), rdtype, nameservers)
+        entry = self._get_cached(key)
+
+        if entry:
+            get_metrics().incr("dns_cache_hits")
+
+            if entry[2]:
+                raise entry[2]
+
+            return entry[1]
+
+        resolver = self._get_resolver(nameservers)
+        attempt = 0
+
+        while True:
+            get_metrics().incr("dns_queries")
+
+            try:
+                answer = resolver.query(name, rdtype, lifetime=lifetime or self.DEFAULT_LIFETIME)
+                break
+
+            except (NXDOMAIN, NoAnswer), e:
+                self._set_cached(key, time() + self._negative_ttl(e), None, e)
+                raise
+
+            except (Timeout, NoNameservers):
+                attempt += 1
+
+                if attempt > self.RETRIES:
+                    raise
+
+        self._set_cached(key, answer.expiration, answer, None)
+
+        return answer
+
+    def gethostbyname(self, name, lifetime=None):
+        """
+        Get the first IPv4 address of the host
+        """
+        return str(self.query(name, "A", lifetime=lifetime)[0])
+
+    def nameservers(self, domain, lifetime=None):
+        """
+        Get name server host names of the domain
+        """
+        names = []
+
+        for record in self.query(domain, "NS", lifetime=lifetime):
+            name = str(record)
+
+            if name[-1] == ".":
+                name = name[:-1]
+
+            names.append(name)
+
+        return names
+
+    def nameserver_ips(self, domain, lifetime=None):
+        """
+        Get name server IP addresses of the domain, name servers which can't be resolved are skipped
+        """
+        ips = []
+
+        for name in self.nameservers(domain, lifetime):
+            try:
+                ip = self.gethostbyname(name, lifetime)
+            except (NXDOMAIN, NoAnswer, NoNameservers, Timeout):
+                continue
+
+            if ip not in ips:
+                ips.append(ip)
+
+        if not ips:
+            raise NoNameservers
+
+        return ips
+
+
+_resolver = CachingResolver()
+
+
+def get_resolver():
+    """
+    Get resolver shared by all tasks of the process
+    """
+    return _resolver
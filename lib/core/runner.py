@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+"""
+Resident task runner.
+
+Keeps one Python process with the heavy dependencies and the Task classes
+of the scripts loaded, and runs each job in a forked child, so jobs don't
+pay for interpreter startup and imports. Every child gets its own working
+directory, process group and copy of the module state, exactly like a
+script started from the command line.
+
+Usage: python -m core.runner [--jobs N] [--preload module,...]
+
+Jobs are read from stdin, one JSON object per line:
+
+    {"id": "1", "script": "/opt/gtta/scripts/dns_a", "args": ["target.txt", "result.txt"]}
+
+"args" are the usual script command line arguments. For every finished job
+a JSON line with the job id, the script exit status and its console output
+is written to stdout.
+"""
+
+import os
+import sys
+import json
+import imp
+import traceback
+from errno import EINTR
+from select import select, error as select_error
+from os.path import abspath, dirname, getmtime, isdir, join
+
+import core
+
+PRELOAD = ["lxml.etree", "netaddr", "requests", "dns.resolver"]
+READ_SIZE = 64 * 1024
+
+
+class TaskLoader(object):
+    """
+    Loads Task classes from script files without running them
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._classes = {}
+        self._loaded = None
+
+    def _collect(self, task_class):
+        """
+        execute_task replacement used while the script module is loaded
+        """
+        self._loaded = task_class
+
+    def load(self, path, cache=True):
+        """
+        Get Task class of the script (reloaded if the script has changed or cache is False)
+        """
+        mtime = getmtime(path)
+        cached = self._classes.get(path)
+
+        if cache and cached and cached[0] == mtime:
+            return cached[1]
+
+        cwd = os.getcwd()
+        self._loaded = None
+        core._task_loader = self._collect
+        sys.path.insert(0, dirname(path))
+
+        try:
+            os.chdir(dirname(path))
+            imp.load_source("gtta_script_%d" % len(self._classes), path)
+
+        finally:
+            os.chdir(cwd)
+            sys.path.remove(dirname(path))
+            core._task_loader = None
+
+        if not self._loaded:
+            raise Exception("Script doesn't execute any task: %s" % path)
+
+        self._classes[path] = (mtime, self._loaded)
+
+        return self._loaded
+
+
+class Runner(object):
+    """
+    Runs jobs in forked children of the resident process
+    """
+
+    def __init__(self, max_jobs=1):
+        """
+        Constructor
+        """
+        self._loader = TaskLoader()
+        self._max_jobs = max_jobs
+        self._running = {}
+
+    def _script_path(self, script):
+        """
+        Get run.py path of the script
+        """
+        script = abspath(script)
+
+        if isdir(script):
+            script = join(script, "run.py")
+
+        return script
+
+    def start(self, job):
+        """
+        Start the job in a child process
+        """
+        path = self._script_path(job["script"])
+        task_class = self._loader.load(path)
+        read_fd, write_fd = os.pipe()
+
+        pid = os.fork()
+
+        if pid == 0:
+            os.close(read_fd)
+            self._run_child(path, task_class, job.get("args", []), write_fd)
+
+        os.close(write_fd)
+        self._running[read_fd] = (pid, job, [])
+
+    def _run_child(self, path, task_class, args, output_fd):
+        """
+        Child process main function, never returns
+        """
+        code = 1
+
+        try:
+            os.dup2(output_fd, 1)
+            os.dup2(output_fd, 2)
+            os.close(output_fd)
+
+            # own process group, so the task can kill its children on timeout
+            os.setpgrp()
+            os.chdir(dirname(path))
+
+            sys.path.insert(0, dirname(path))
+            sys.argv[:] = [path] + list(args)
+
+            # blocking calls are patched in the job process only (core.green doesn't patch
+            # the runner), the script is loaded again to import the patched calls
+            if task_class.ASYNC:
+                from core import green
+                green.patch()
+                task_class = self._loader.load(path, cache=False)
+
+            core.execute_task(task_class)
+            code = 0
+
+        except SystemExit, e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+
+        except BaseException:
+            traceback.print_exc()
+
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def _finish(self, fd):
+        """
+        Collect the finished child and report the job status
+        """
+        pid, job, output = self._running.pop(fd)
+        os.close(fd)
+
+        _, status = os.waitpid(pid, 0)
+
+        if os.WIFEXITED(status):
+            code = os.WEXITSTATUS(status)
+        else:
+            code = -os.WTERMSIG(status)
+
+        self._report(job, code, "".join(output))
+
+    def _report(self, job, code, output):
+        """
+        Write job status
+        """
+        sys.stdout.write(json.dumps({
+            "id": job.get("id"),
+            "status": code,
+            "output": output.decode("utf-8", "replace"),
+        }) + "\n")
+        sys.stdout.flush()
+
+    def _parse_job(self, line):
+        """
+        Parse and start job
+        """
+        try:
+            job = json.loads(line)
+        except ValueError:
+            self._report({}, 1, "Invalid job: %s" % line)
+            return
+
+        try:
+            self.start(job)
+        except Exception, e:
+            self._report(job, 1, "%s: %s" % (e.__class__.__name__, str(e)))
+
+    def serve(self, stream):
+        """
+        Run jobs from the stream until it is closed and all jobs are finished
+        """
+        input_fd = stream.fileno()
+        reading = True
+        buffer = ""
+        pending = []
+
+        while reading or pending or self._running:
+            while pending and len(self._running) < self._max_jobs:
+                self._parse_job(pending.pop(0))
+
+            fds = self._running.keys()
+
+            if reading:
+                fds.append(input_fd)
+
+            if not fds:
+                continue
+
+            try:
+                ready, _, _ = select(fds, [], [])
+            except select_error, e:
+                if e.args[0] == EINTR:
+                    continue
+
+                raise
+
+            for fd in ready:
+                data = os.read(fd, READ_SIZE)
+
+                if fd != input_fd:
+                    if data:
+                        self._running[fd][2].append(data)
+                    else:
+                        self._finish(fd)
+
+                    continue
+
+                if not data:
+                    reading = False
+                    data = "\n"
+
+                buffer += data
+                lines = buffer.split("\n")
+                buffer = lines.pop()
+                pending.extend(line.strip() for line in lines if line.strip())
+
+
+def preload(modules):
+    """
+    Import heavy modules once, so forked jobs don't import them again
+    """
+    for module in modules:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+
+
+def main():
+    """
+    Runner entry point
+    """
+    max_jobs = 1
+    modules = PRELOAD
+    args = sys.argv[1:]
+
+    while args:
+        arg = args.pop(0)
+
+        if arg == "--jobs":
+            max_jobs = int(args.pop(0))
+        elif arg == "--preload":
+            modules = modules + args.pop(0).split(",")
+
+    preload(modules)
+    Runner(max_jobs).serve(sys.stdin)
+
+
+if __name__ == "__main__":
+    main()
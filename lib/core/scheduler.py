@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+from threading import Event, Lock
+from time import time, sleep
+
+
+class Scheduler(object):
+    """
+    Worker thread scheduler with per-target deadlines and adaptive worker count
+    """
+    TICK_INTERVAL = 0.5  # how often deadlines are checked while waiting
+    CANCEL_GRACE = 5  # seconds a cancelled worker has to notice the cancellation
+    SCALE_STEP = 2  # workers added or removed at once
+
+    def __init__(self, task):
+        """
+        Constructor
+        """
+        self._task = task
+        self._queue = task._queue
+        self._lock = Lock()
+        self._workers = set()
+        self._running = {}
+        self._cancelled = {}
+        self._latencies = []
+        self._errors = 0
+        self._best_latency = None
+        self._last_scale = time()
+        self.stopped = Event()
+
+        # no point in having more workers than targets
+        self.max_size = max(1, min(task.MAX_THREAD_COUNT, len(task.targets)))
+        self.min_size = max(1, min(task.MIN_THREAD_COUNT, self.max_size))
+        self.size = min(max(task.THREAD_COUNT, self.min_size), self.max_size)
+
+    def run(self):
+        """
+        Feed targets to the workers and supervise them until all targets are processed
+        """
+        targets = self._task._pending_targets()
+        target = next(targets, None)
+        last_tick = 0
+
+        if target is None:
+            self._queue.close()
+
+        while True:
+            self._task._check_stop()
+
+            if time() - last_tick >= self.TICK_INTERVAL:
+                self._tick()
+                last_tick = time()
+
+            if target is None:
+                if not self._alive():
+                    break
+
+                sleep(self.TICK_INTERVAL)
+
+            elif self._queue.put(target):
+                target = next(targets, None)
+
+                if target is None:
+                    self._queue.close()
+
+    def stop(self):
+        """
+        Stop all workers
+        """
+        self.stopped.set()
+
+        with self._lock:
+            workers = list(self._workers) + self._cancelled.keys()
+
+        for worker in workers:
+            worker.stop()
+
+    def target_started(self, worker):
+        """
+        Called by worker when it starts a target
+        """
+        with self._lock:
+            self._running[worker] = time()
+
+    def target_finished(self, worker, error):
+        """
+        Called by worker when target is finished
+        """
+        with self._lock:
+            started = self._running.pop(worker, None)
+            self._cancelled.pop(worker, None)
+
+            if started is not None:
+                self._latencies.append(time() - started)
+
+            if error:
+                self._errors += 1
+
+            # errors written by workers make the whole task fail
+            if worker.error:
+                self._task.error = True
+
+            # the cancellation (if any) belonged to the finished target
+            if not self.stopped.isSet():
+                worker._stop.clear()
+
+    def retire(self, worker):
+        """
+        Check if worker should exit because the pool has shrunk
+        """
+        with self._lock:
+            if worker not in self._workers:
+                return True
+
+            if len(self._workers) > self.size:
+                self._workers.discard(worker)
+                return True
+
+        return False
+
+    def _alive(self):
+        """
+        Check if any worker is still processing targets
+        """
+        with self._lock:
+            self._workers = set(w for w in self._workers if w.isAlive())
+            return len(self._workers) > 0
+
+    def _tick(self):
+        """
+        Enforce deadlines, rescale the pool and start missing workers
+        """
+        self._check_deadlines()
+
+        if time() - self._last_scale >= self._task.SCALE_INTERVAL:
+            self._scale()
+            self._last_scale = time()
+
+        self._spawn()
+
+    def _check_deadlines(self):
+        """
+        Cancel targets which have run out of time
+        """
+        deadline = self._task.TARGET_TIMEOUT
+
+        if not deadline:
+            return
+
+        now = time()
+
+        with self._lock:
+            for worker, started in self._running.items():
+                if worker in self._cancelled:
+                    # worker ignores cancellation, replace it
+                    if now - self._cancelled[worker] > self.CANCEL_GRACE:
+                        self._workers.discard(worker)
+
+                elif now - started > deadline:
+                    self._cancelled[worker] = now
+                    worker.stop()
+
+    def _scale(self):
+        """
+        Grow or shrink the pool based on latency and error rate
+        """
+        with self._lock:
+            latencies, self._latencies = self._latencies, []
+            errors, self._errors = self._errors, 0
+
+        if not latencies:
+            return
+
+        latency = sum(latencies) / len(latencies)
+        error_rate = float(errors) / len(latencies)
+
+        if self._best_latency is None or latency < self._best_latency:
+            self._best_latency = latency
+
+        if error_rate > self._task.MAX_ERROR_RATE:
+            self.size = max(self.min_size, self.size * 3 / 4)
+
+        elif latency > self._best_latency * self._task.LATENCY_TOLERANCE:
+            self.size = max(self.min_size, self.size - self.SCALE_STEP)
+
+        elif self._queue.pending() > 0:
+            self.size = min(self.max_size, self.size + self.SCALE_STEP)
+
+    def _spawn(self):
+        """
+        Start workers until the pool has the desired size
+        """
+        if self._queue.closed() and not self._queue.pending():
+            return
+
+        with self._lock:
+            self._workers = set(w for w in self._workers if w.isAlive())
+
+            while len(self._workers) < self.size:
+                worker = self._task._create_worker()
+                worker._scheduler = self
+                worker.daemon = True
+
+                self._workers.add(worker)
+                worker.start()
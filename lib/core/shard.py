@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+"""
+Target sharding across scan nodes.
+
+Every node runs the same script with the same target file and its own shard:
+
+    run.py target.txt result-0.txt --shard=0/4:seed
+    GTTA_SHARD=0/4 GTTA_SHARD_SEED=seed run.py target.txt result-0.txt
+
+Expanded targets are assigned to shards with jump consistent hashing, so
+no coordination is needed and changing the number of shards moves as few
+targets as possible. Shard results are merged with:
+
+    python -m core.shard merge result.txt result-0.txt result-1.txt ...
+"""
+
+import sys
+from os import environ
+
+INFO_SUFFIX = ".shard.json"
+
+
+def jump_hash(key, buckets):
+    """
+    Jump consistent hash (Lamping, Veach), maps 64-bit key to a bucket
+    """
+    bucket, jump = -1, 0
+
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+
+    return bucket
+
+
+class Shard(object):
+    """
+    Part of the targets processed by one node
+    """
+
+    def __init__(self, index, count, seed=""):
+        """
+        Constructor
+        """
+        if count < 1 or not 0 <= index < count:
+            raise ValueError("Invalid shard: %d/%d" % (index, count))
+
+        self.index = index
+        self.count = count
+        self.seed = seed
+
+    def shard_of(self, target):
+        """
+        Get shard index of the target
+        """
+        from hashlib import md5
+        from struct import unpack
+
+        if isinstance(target, unicode):
+            target = target.encode("utf-8")
+
+        key = unpack("<Q", md5("%s\0%s" % (self.seed, target)).digest()[:8])[0]
+
+        return jump_hash(key, self.count)
+
+    def __contains__(self, target):
+        return self.shard_of(target) == self.index
+
+    def __str__(self):
+        return "%d/%d:%s" % (self.index, self.count, self.seed)
+
+
+def parse_shard(spec, seed=None):
+    """
+    Parse "index/count[:seed]" shard spec
+    """
+    try:
+        spec, _, spec_seed = spec.partition(":")
+        index, count = spec.split("/")
+
+        return Shard(int(index), int(count), spec_seed or seed or "")
+
+    except ValueError:
+        raise ValueError("Invalid shard: %s" % spec)
+
+
+def get_shard(args):
+    """
+    Get shard from the --shard=index/count[:seed] argument (removed from args)
+    or GTTA_SHARD and GTTA_SHARD_SEED environment variables, None if not sharded
+    """
+    spec = environ.get("GTTA_SHARD")
+
+    for arg in list(args):
+        if arg.startswith("--shard="):
+            spec = arg.split("=", 1)[1]
+            args.remove(arg)
+
+    if not spec:
+        return None
+
+    return parse_shard(spec, environ.get("GTTA_SHARD_SEED"))
+
+
+def write_info(path, shard, inputs, produced_output):
+    """
+    Write shard description next to the result file
+    """
+    import json
+
+    with open(path + INFO_SUFFIX, "w") as f:
+        json.dump({
+            "index": shard.index,
+            "count": shard.count,
+            "seed": shard.seed,
+            "inputs": inputs,
+            "produced_output": produced_output,
+        }, f)
+
+
+def merge(output, paths):
+    """
+    Merge shard result files in the shard order, shards without output are skipped
+    (if no shard has output, the result of the first shard is used)
+    """
+    import json
+
+    shards = []
+
+    for path in paths:
+        with open(path + INFO_SUFFIX) as f:
+            shards.append((json.load(f), path))
+
+    shards.sort(key=lambda item: item[0]["index"])
+    first = shards[0][0]
+
+    for info, path in shards:
+        if (info["count"], info["seed"], info["inputs"]) != (first["count"], first["seed"], first["inputs"]):
+            raise ValueError("Shard doesn't belong to the same run: %s" % path)
+
+    indexes = [info["index"] for info, _ in shards]
+
+    if indexes != range(first["count"]):
+        raise ValueError("Missing or duplicate shards: %s" % ", ".join(map(str, indexes)))
+
+    merged = [path for info, path in shards if info["produced_output"]] or [shards[0][1]]
+
+    with open(output, "wb") as out:
+        for path in merged:
+            with open(path, "rb") as f:
+                while True:
+                    data = f.read(64 * 1024)
+
+                    if not data:
+                        break
+
+                    out.write(data)
+
+
+def main():
+    """
+    Command line entry point
+    """
+    if len(sys.argv) < 4 or sys.argv[1] != "merge":
+        print "Usage: python -m core.shard merge <output> <shard result> ..."
+        sys.exit(1)
+
+    try:
+        merge(sys.argv[2], sys.argv[3:])
+    except (IOError, ValueError), e:
+        print "%s: %s" % (e.__class__.__name__, str(e))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+import urlparse
+import zlib
+from collections import deque
+from xml.parsers import expat
+import http
+
+MAX_SITEMAPS = 50  # sitemaps read per site (including sitemap indexes)
+MAX_SITEMAP_SIZE = 50 * 1024 * 1024  # uncompressed sitemap size limit of the sitemap protocol
+MAX_ROBOTS_SIZE = 512 * 1024
+READ_SIZE = 64 * 1024
+
+
+def robots(root, headers=None):
+    """
+    Get sitemaps and the allowed and disallowed paths (without wildcards) listed in robots.txt
+    """
+    sitemaps, paths = [], []
+
+    try:
+        resp = http.get(
+            urlparse.urljoin(root, "/robots.txt"),
+            headers=headers,
+            verify=False,
+            max_bytes=MAX_ROBOTS_SIZE
+        )
+    except Exception:
+        return sitemaps, paths
+
+    if resp.status_code != 200:
+        return sitemaps, paths
+
+    for line in resp.text.splitlines():
+        name, _, value = line.split("#", 1)[0].partition(":")
+        name, value = name.strip().lower(), value.strip()
+
+        if name == "sitemap" and value:
+            sitemaps.append(urlparse.urljoin(root, value))
+
+        elif name in ("allow", "disallow") and value.startswith("/") and "*" not in value and "$" not in value:
+            paths.append(urlparse.urljoin(root, value))
+
+    return sitemaps, paths
+
+
+class _SitemapParser(object):
+    """
+    Incremental sitemap and sitemap index parser
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._parser = expat.ParserCreate(namespace_separator=" ")
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._data
+        self._parser.EntityDeclHandler = self._entity
+        self._elements = []
+        self._text = []
+        self.found = []  # ("url" or "sitemap", location)
+
+    def _entity(self, *args):
+        """
+        Entities are not allowed, they could expand to a huge document
+        """
+        raise ValueError("Entity declaration in sitemap.")
+
+    def _start(self, name, attrs):
+        self._elements.append(name.rsplit(" ", 1)[-1])
+        self._text = []
+
+    def _data(self, data):
+        if self._elements and self._elements[-1] == "loc":
+            self._text.append(data)
+
+    def _end(self, name):
+        element = self._elements.pop()
+
+        if element == "loc" and self._elements and self._elements[-1] in ("url", "sitemap"):
+            location = "".join(self._text).strip()
+
+            if location:
+                self.found.append((self._elements[-1], location))
+
+    def feed(self, data, final=False):
+        """
+        Parse data chunk
+        """
+        self._parser.Parse(data, final)
+
+
+def read_sitemap(url, headers=None):
+    """
+    Iterate ("url" or "sitemap", location) items of the sitemap (gzipped or not)
+    while it is being downloaded
+    """
+    resp = http.stream("GET", url, headers=headers, verify=False)
+
+    try:
+        if resp.status_code != 200:
+            return
+
+        parser = _SitemapParser()
+        decompressor = None
+        size = 0
+
+        for chunk in resp.iter_content(READ_SIZE):
+            # .xml.gz files are usually served without content encoding
+            if decompressor is None:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == "\x1f\x8b" else False
+
+            while chunk:
+                if decompressor:
+                    data = decompressor.decompress(chunk, READ_SIZE)
+                    chunk = decompressor.unconsumed_tail
+                else:
+                    data, chunk = chunk, None
+
+                size += len(data)
+
+                if size > MAX_SITEMAP_SIZE:
+                    return
+
+                parser.feed(data)
+
+                for item in parser.found:
+                    yield item
+
+                parser.found = []
+
+        parser.feed("", True)
+
+        for item in parser.found:
+            yield item
+
+    finally:
+        resp.close()
+
+
+def seeds(root, headers=None, max_sitemaps=MAX_SITEMAPS):
+    """
+    Iterate site URLs listed in robots.txt and sitemaps (robots.txt sitemaps or /sitemap.xml),
+    sitemap indexes are followed
+    """
+    sitemaps, paths = robots(root, headers)
+
+    for path in paths:
+        yield path
+
+    queue = deque(sitemaps or [urlparse.urljoin(root, "/sitemap.xml")])
+    seen = set()
+
+    while queue and len(seen) < max_sitemaps:
+        sitemap = queue.popleft()
+
+        if sitemap in seen:
+            continue
+
+        seen.add(sitemap)
+
+        try:
+            for kind, location in read_sitemap(sitemap, headers):
+                location = urlparse.urljoin(sitemap, location)
+
+                if kind == "sitemap":
+                    queue.append(location)
+                else:
+                    yield location
+
+        except Exception:
+            continue
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+import re
+from threading import Event, Lock
+from Queue import Queue, Empty, Full
+
+NETWORK_PATTERN = '^\d+\.\d+\.\d+\.\d+\/(3[0-2]|2[0-9]{1}|[01]?[0-9])$'
+RANGE_PATTERN = '^\d+\.\d+\.\d+\.\d+\s*\-\s*\d+\.\d+\.\d+\.\d+$'
+
+
+def _parse_target(target):
+    """
+    Returns IPNetwork or IPRange for network and range targets, None otherwise
+    """
+    # netaddr is loaded only if there is something to expand
+    if re.match(NETWORK_PATTERN, target):
+        from netaddr import IPNetwork
+        return IPNetwork(target)
+
+    if re.match(RANGE_PATTERN, target):
+        from netaddr import IPRange
+        scope = target.replace(" ", "").split("-")
+        return IPRange(scope[0], scope[1])
+
+    return None
+
+
+class TargetList(object):
+    """
+    Lazily expanded list of targets (networks and ranges are expanded on iteration),
+    only targets of the shard are listed if the shard is given
+    """
+    EXACT_SHARD_SIZE = 65536  # larger shards are not counted, their size is estimated
+
+    def __init__(self, targets, shard=None):
+        """
+        Constructor
+        """
+        self._targets = targets
+        self._shard = shard
+        self._size = None
+
+    def _expand(self):
+        """
+        Iterate over expanded targets of all shards
+        """
+        for target in self._targets:
+            scope = _parse_target(target)
+
+            if scope is None:
+                yield target
+                continue
+
+            for ip in scope:
+                yield '%s' % ip
+
+    def __iter__(self):
+        """
+        Iterate over expanded targets
+        """
+        if not self._shard:
+            return self._expand()
+
+        return (target for target in self._expand() if target in self._shard)
+
+    def __len__(self):
+        """
+        Number of targets after expansion
+        """
+        if self._size is None:
+            self._size = self._count()
+
+        return self._size
+
+    def _count(self):
+        """
+        Count targets
+        """
+        total = self._count_all()
+
+        if not self._shard:
+            return total
+
+        if total <= self.EXACT_SHARD_SIZE:
+            return sum(1 for _ in self)
+
+        return (total + self._shard.count - 1) / self._shard.count
+
+    def _count_all(self):
+        """
+        Number of targets of all shards
+        """
+        count = 0
+
+        for target in self._targets:
+            scope = _parse_target(target)
+            count += scope.size if scope is not None else 1
+
+        return count
+
+    def __nonzero__(self):
+        """
+        Check if list is not empty
+        """
+        if self._shard:
+            return len(self) > 0
+
+        return len(self._targets) > 0
+
+
+class TargetQueue(object):
+    """
+    Bounded queue which feeds targets to worker threads
+    """
+    PUT_TIMEOUT = 1
+    GET_TIMEOUT = 1
+
+    def __init__(self, size):
+        """
+        Constructor
+        """
+        self._queue = Queue(size)
+        self._closed = Event()
+        self._lock = Lock()
+        self.processed = 0
+
+    def put(self, target):
+        """
+        Put target to the queue, returns False if the queue is still full
+        """
+        try:
+            self._queue.put(target, timeout=self.PUT_TIMEOUT)
+        except Full:
+            return False
+
+        return True
+
+    def close(self):
+        """
+        No more targets will be added
+        """
+        self._closed.set()
+
+    def closed(self):
+        """
+        Check if the queue is closed
+        """
+        return self._closed.isSet()
+
+    def pending(self):
+        """
+        Number of targets waiting in the queue
+        """
+        return self._queue.qsize()
+
+    def get(self):
+        """
+        Get next target, returns None if the queue is closed and empty
+        """
+        while True:
+            try:
+                return self._queue.get(timeout=self.GET_TIMEOUT)
+            except Empty:
+                if not self._closed.isSet():
+                    continue
+
+            # all targets were added before closing, so emptiness is final here
+            try:
+                return self._queue.get_nowait()
+            except Empty:
+                return None
+
+    def task_done(self):
+        """
+        Mark target as processed
+        """
+        with self._lock:
+            self.processed += 1
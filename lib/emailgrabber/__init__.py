@@ -2,14 +2,14 @@
 import re
 import requests
 from BeautifulSoup import BeautifulSoup
-from core import Task
+from core import Task, http
+from core.ratelimit import get_limiter
 
 
 class CommonIGEmailTask(Task):
     """
     Common abstract class for ig_email parsers
     """
-    results = set()
     parser = None
     HEADERS = {"User-Agent": "Mozilla/5.0"}
     TEST_TIMEOUT = 2 * 60
@@ -35,7 +35,7 @@ class CommonIGEmailTask(Task):
 
         for url in self.parser(self._wrapped_target()).process(*args):
             try:
-                req = requests.get(url, headers=self.HEADERS, verify=False)
+                req = http.get(url, headers=self.HEADERS, verify=False, timeout=self.HTTP_TIMEOUT)
 
                 if "text/html" not in req.headers["content-type"]:
                     continue
@@ -43,9 +43,8 @@ class CommonIGEmailTask(Task):
                 soup = BeautifulSoup(req.content)
 
                 for email in parse_soup(soup):
-                    if email not in self.results:
+                    if self._unique().add(email):
                         self._write_result(email)
-                        self.results.add(email)
 
             except Exception as e:
                 continue
@@ -56,6 +55,7 @@ class CommonIGEmailParser(object):
     Abstract class for parsing of results of search
     """
     HOST = ""
+    REQUEST_RATE = None  # requests per second to HOST, shared by all targets (None - unlimited)
     req_source = requests.Session()
     headers = {
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
@@ -89,12 +89,13 @@ class CommonIGEmailParser(object):
         if use_post:
             req_method = self.req_source.post
 
-        req = req_method(
-            "%s%s" % (self.HOST, path),
-            headers=self.headers,
-            verify=False,
-            **kwargs
-        )
+        with get_limiter().limit(self.HOST, rate=self.REQUEST_RATE):
+            req = req_method(
+                "%s%s" % (self.HOST, path),
+                headers=self.headers,
+                verify=False,
+                **kwargs
+            )
 
         return BeautifulSoup(req.content)
 
@@ -12,7 +12,6 @@ class CommonIGDomainToolsTask(Task):
     TEST_TIMEOUT = 2 * 60
     parser = None
     params = None
-    results = set()
     whois_path = "http://whois.domaintools.com/"
     domain_re = r"^([a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,6}$"
     ip_re = r"\b" \
@@ -32,7 +31,7 @@ class CommonIGDomainToolsTask(Task):
         Output result
         """
         self._write_result("\n".join(
-            filter(lambda x: re.match(self.domain_re, x), self.results)))
+            filter(lambda x: re.match(self.domain_re, x), self._unique())))
 
     def _strip_url(self, url):
         """
@@ -52,9 +51,8 @@ class CommonIGDomainToolsTask(Task):
         for url in self.parser(self._wrap_target(query)).process(*self.params):
             url = self._strip_url(url)
 
-            if url not in self.results:
+            if self._unique().add(url):
                 self._write_result(url)
-                self.results.add(url)
 
     def _search_by_ip(self):
         """
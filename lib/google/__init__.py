@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-from time import sleep
 from emailgrabber import CommonIGEmailParser
 
 
@@ -10,6 +9,7 @@ class Google(CommonIGEmailParser):
     HOST = "https://www.google.com"
     SEARCH_LIMIT = 1000
     SEARCH_OFFSET = 100
+    REQUEST_RATE = 1 / 3.0  # Google bans clients which search too often
 
     def _collect_results_from_soup(self, soup):
         """
@@ -54,7 +54,6 @@ class Google(CommonIGEmailParser):
         start = 0
 
         while start <= self.SEARCH_LIMIT:
-            sleep(3)
             start += self.SEARCH_OFFSET
             params["start"] = str(start)
             soup = self._get_soup(path=path, params=params)
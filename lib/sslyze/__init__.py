@@ -8,15 +8,16 @@ from core import call, Task
 _SSLYZE_CMD = os.path.join(os.path.dirname(__file__), "sslyze", "sslyze.py")
 
 
-def call_sslyze(target, port, commands, timeout=15):
+def call_sslyze(target, port, commands, timeout=15, check=None, deadline=None):
     """
     Calls sslyze, and returns the result
     Result: (success: boolean, data: unicode)
+    sslyze is killed when check raises (e.g. Task._check_stop) or after deadline seconds
     """
     commands.insert(0, '--timeout=%s' % timeout)
     commands.append("%s:%s" % (target, str(port)))
 
-    return call.call(["python", _SSLYZE_CMD] + commands)
+    return call.call(["python", _SSLYZE_CMD] + commands, check=check, timeout=deadline)
 
 
 class SSLyzeLauncher(Task):
@@ -47,7 +48,9 @@ class SSLyzeLauncher(Task):
             target=target,
             port=port,
             timeout=self.SOCKET_TIMEOUT,
-            commands=self._get_commands()
+            commands=self._get_commands(),
+            check=self._check_stop,
+            deadline=self.COMMAND_TIMEOUT
         )
 
         self._check_stop()
@@ -56,6 +59,9 @@ class SSLyzeLauncher(Task):
             self._write_result('sslyze launching error!')
 
         else:
+            if called_ok == call.TIMED_OUT:
+                self._write_result('sslyze has timed out, the result is incomplete.')
+
             self._check_stop()
             warning = re.search(r'(WARNING:.*)\n', output)
 
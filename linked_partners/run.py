@@ -6,20 +6,13 @@ class ExternalLinksTask(Task):
     """
     External links collector
     """
-    def __init__(self):
-        """
-        Constructor
-        """
-        super(ExternalLinksTask, self).__init__()
-        self.links = []
 
     def _write_link(self, link):
         """
         Write a link
         """
-        if link not in self.links:
+        if self._unique("links").add(link):
             self._write_result(link)
-            self.links.append(link)
 
     def main(self, *args):
         """
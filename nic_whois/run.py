@@ -4,6 +4,7 @@ from socket import socket, AF_INET, SOCK_STREAM, error as socket_error, gethostb
 from errno import EINPROGRESS, EALREADY
 from select import select
 from core import Task, execute_task
+from core.cache import get_cache
 from core.error import GTTAError
 
 class TimedOut(GTTAError):
@@ -84,6 +85,15 @@ class NIC_Whois(Task):
 
         return page
 
+    def lookup_whois(self, query, server):
+        """
+        Query whois, returns None if the server has no match
+        """
+        try:
+            return self.query_whois(query, server)
+        except NoMatch:
+            return None
+
     def main(self, *args):
         """
         Main function
@@ -95,14 +105,19 @@ class NIC_Whois(Task):
                 self._write_result('Host not found: %s' % self.host)
                 return
 
+        cache = get_cache()
+
         for server in self.SERVER_LIST:
             try:
-                res = self.query_whois(self.ip, server)
-                self._write_result(res)
+                res = cache.fetch("whois", (server, self.ip), self.lookup_whois, self.ip, server)
 
             except:
                 continue
 
+            if res is None:
+                continue
+
+            self._write_result(res)
             break
 
         if not self.produced_output:
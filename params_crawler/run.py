@@ -105,7 +105,7 @@ class Params_Craw(Task):
         """
         Main function
         """
-        link_crawler = LinkCrawler()
+        link_crawler = LinkCrawler(sitemaps=True)
         link_crawler.stop_callback = self._check_stop
         link_crawler.link_callback = self.collect_params
         link_crawler.link_content_callback = self.collect_form_params
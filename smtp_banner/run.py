@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import core.green
 from re import match
 from string import strip
 from socket import socket, AF_INET, SOCK_STREAM
@@ -9,6 +10,8 @@ class SMTP_Banner(Task):
     """
     Return SMTP Banner
     """
+    ASYNC = True
+    CHECKPOINT = True
     MAX_LINES = 5
 
     def main(self, *args):
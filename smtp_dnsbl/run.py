@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 
-from dns.resolver import Resolver
 from socket import gethostbyname
 from core import Task, execute_task
 from core.error import InvalidTarget
+from core.resolver import get_resolver
 
 class SMTP_DNSBL(Task):
     """
@@ -45,26 +45,21 @@ class SMTP_DNSBL(Task):
         reversed_ip.reverse()
         reversed_ip = ".".join(reversed_ip)
 
+        r = get_resolver()
+
         for blacklist in self.BLACKLISTS:
             self._check_stop()
 
             try:
                 domain = "%s.%s" % (reversed_ip, blacklist)
-
-                r = Resolver()
-                r.lifetime = self.DNS_TIMEOUT
-
-                result = r.query(domain, "A")
+                result = r.query(domain, "A", lifetime=self.DNS_TIMEOUT)
 
                 if result and len(result) > 0:
                     info = None
 
                     # try to request a TXT record
                     try:
-                        r = Resolver()
-                        r.lifetime = self.DNS_TIMEOUT
-
-                        result = r.query(domain, "TXT")
+                        result = r.query(domain, "TXT", lifetime=self.DNS_TIMEOUT)
 
                         if result and len(result) > 0:
                             info = str(result[0])
@@ -2,11 +2,14 @@
 
 from smtplib import SMTP
 from core import Task, execute_task
+from core.ratelimit import get_limiter
 
 class SMTP_User_Verification(Task):
     """
     SMTP filter
     """
+    COMMAND_RATE = 2  # VRFY commands per second per server, servers tarpit clients which are faster
+    COMMAND_BURST = 3
 
     def main(self, vrfy_users=[], src=[], dst=[], *args):
         """
@@ -41,6 +44,13 @@ class SMTP_User_Verification(Task):
                 if len(email) < 6:
                     continue
 
+                get_limiter().wait(
+                    "%s:25" % target,
+                    rate=self.COMMAND_RATE,
+                    burst=self.COMMAND_BURST,
+                    check=self._check_stop
+                )
+
                 try:
                     reply = smtp.verify(email)
                     self._write_result('VRFY <%s>\n%s' % ( email, ' '.join(map(str, reply)) ))
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 
 from socket import gethostbyname
-from scapy.all import sr1, IP, UDP, SNMP, SNMPget, SNMPvarbind, ASN1_OID, ICMP
+from scapy.sendrecv import sr1
+from scapy.layers.inet import IP, UDP, ICMP
+from scapy.layers.snmp import SNMP, SNMPget, SNMPvarbind
+from scapy.asn1.asn1 import ASN1_OID
 from core import Task, execute_task, SANDBOX_IP
 from core.error import InvalidTarget
 
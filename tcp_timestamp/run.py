@@ -2,7 +2,8 @@
 
 from socket import gethostbyname
 from time import sleep
-from scapy.all import sr1, IP, TCP
+from scapy.sendrecv import sr1
+from scapy.layers.inet import IP, TCP
 from core import Task, execute_task, SANDBOX_IP
 from core.error import InvalidTarget
 
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 
-from subprocess import Popen, PIPE, STDOUT
 from core import Task, execute_task
 
 class TCP_Traceroute(Task):
@@ -20,23 +19,23 @@ class TCP_Traceroute(Task):
 
         self._check_stop()
 
-        self._write_result(
-            Popen(
-                [
-                    "/usr/sbin/tcptraceroute",
-                    "-m",
-                    str(self.MAX_HOPS),
-                    target,
-                    str(self.port)
-                ],
-                stdout = PIPE,
-                stderr = STDOUT,
-                shell  = False
-            ).communicate()[0]
+        # hops are written as they are probed
+        called_ok, _ = self._call(
+            [
+                "/usr/sbin/tcptraceroute",
+                "-m",
+                str(self.MAX_HOPS),
+                target,
+                str(self.port)
+            ],
+            stream=True
         )
 
         self._check_stop()
 
+        if not called_ok:
+            raise Exception('Traceroute launching error!')
+
         if not self.produced_output:
             self._write_result("No result.")
 
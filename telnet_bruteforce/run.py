@@ -2,6 +2,7 @@
 
 from telnetlib import Telnet, TELNET_PORT
 from core import Task, execute_task
+from core.ratelimit import get_limiter
 
 
 class TelnetBruteforce(Task):
@@ -10,6 +11,8 @@ class TelnetBruteforce(Task):
     """
     TEST_TIMEOUT = 120
     TELNET_TIMEOUT = 10
+    LOGIN_RATE = 5  # login attempts per second per server
+    LOGIN_BURST = 5
 
     def main(self, *args):
         """
@@ -37,6 +40,14 @@ class TelnetBruteforce(Task):
                     continue
 
                 ctr += 1
+
+                get_limiter().wait(
+                    "%s:%d" % (target, port),
+                    rate=self.LOGIN_RATE,
+                    burst=self.LOGIN_BURST,
+                    check=self._check_stop
+                )
+
                 telnet = Telnet(target, port, self.TELNET_TIMEOUT)
                 response = telnet.read_until("login:", self.TELNET_TIMEOUT)
 
@@ -1,6 +1,6 @@
 # coding: utf-8
 
-from core import Task, execute_task, call
+from core import Task, execute_task
 import os
 
 class TheHarvesterEmailsTask(Task):
@@ -17,18 +17,16 @@ class TheHarvesterEmailsTask(Task):
         """
         cmd = os.path.join(self._get_library_path("harvester"), "theHarvester_email.py")
 
-        ok, output = call.call([
+        ok, _ = self._call([
             "python",
             cmd,
             "-b",
             "all",
             "-d",
             self.target
-        ])
+        ], stream=True)
 
-        if ok:
-            self._write_result(output)
-        else:
+        if not ok:
             self._write_result("ERROR CALLING theHarvester script")
 
     def test(self):
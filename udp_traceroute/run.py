@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from core import call, Task, execute_task
+from core import Task, execute_task
 
 class TracerouteTask(Task):
     """
@@ -13,17 +13,24 @@ class TracerouteTask(Task):
         target = self.host or self.ip
 
         self._check_stop()
-        called_ok, output = call.call(["traceroute", target])
+        called_ok, _ = self._call(
+            ["traceroute", target],
+            stream=lambda line: self._write_line(line, target)
+        )
 
         self._check_stop()
 
         if not called_ok:
             self._write_result('Traceroute launching error!')
+
+    def _write_line(self, line, target):
+        """
+        Write traceroute output line
+        """
+        if line.find('Cannot handle "host"') >= 0:
+            self._write_result('Host not found: %s' % target)
         else:
-            if output.find('Cannot handle "host"') >= 0:
-                self._write_result('Host not found: %s' % target)
-            else:
-                self._write_result(output)
+            self._write_result(line)
 
     def test(self):
         """
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 
-import urllib
-from core import Task, execute_task
+from core import Task, execute_task, http
 
 class AccessUserDirsTask(Task):
     """
@@ -24,16 +23,16 @@ class AccessUserDirsTask(Task):
             self._check_stop()
 
             try:
-                res = urllib.urlopen("%s/~%s" % (target, username))
+                res = http.get("%s/~%s" % (target, username), timeout=self.HTTP_TIMEOUT)
 
-                if res.code == 403:
+                if res.status_code == 403:
                     msg = 'User "%s": user directory is accessible'
                 else:
                     msg = 'User "%s": user directory is NOT accessible'
 
                 msg = msg % username
 
-            except IOError:
+            except http.RequestException:
                 msg = "Connection error"
 
             self._write_result(msg)
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from httplib import HTTPConnection, HTTPSConnection, HTTPException
-from core import Task, execute_task
+from core import Task, execute_task, http
 
 
 class Web_HTTP_Methods(Task):
@@ -25,17 +24,12 @@ class Web_HTTP_Methods(Task):
             elif self.proto == 'https':
                 self.port = 443
 
-        class_name = HTTPConnection
-
-        if self.proto == 'https':
-            class_name = HTTPSConnection
+        # all methods are sent over the same keep-alive connection
+        url = '%s://%s:%s/' % (self.proto, self.target, self.port)
 
         try:
-            conn = class_name(host=self.target, port=self.port, timeout=self.HTTP_TIMEOUT)
-            conn.request('OPTIONS', '/')
-
-            response = conn.getresponse()
-            methods  = response.getheader('Allow')
+            response = http.options(url, timeout=self.HTTP_TIMEOUT, allow_redirects=False)
+            methods  = response.headers.get('Allow')
 
             self._check_stop()
 
@@ -57,12 +51,9 @@ class Web_HTTP_Methods(Task):
                 for method in self.DANGEROUS_METHODS:
                     self._check_stop()
 
-                    conn = HTTPConnection(self.target, timeout=self.HTTP_TIMEOUT)
-                    conn.request(method, '/')
-
-                    response = conn.getresponse()
+                    response = http.request(method, url, timeout=self.HTTP_TIMEOUT, allow_redirects=False)
 
-                    if response.status not in ( 405, 501 ):
+                    if response.status_code not in ( 405, 501 ):
                         methods.append(method)
 
             if len(methods) > 0:
@@ -70,7 +61,7 @@ class Web_HTTP_Methods(Task):
             else:
                 self._write_result('No dangerous methods allowed.')
 
-        except HTTPException:
+        except http.RequestException:
             self._write_result('HTTP error.')
             return
 
@@ -8,6 +8,7 @@ class Web_SQL_XSS(Task):
     """
     Web SQL/XSS vulnerability scanner
     """
+    PROCESSES = 4
     DEFAULT_PAGETYPE  = 'php'
     DEFAULT_URL_LIMIT = 100
 